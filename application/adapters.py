@@ -0,0 +1,113 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import socket
+from time import perf_counter
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from .deadline import register
+from .timing import phase, record, record_response
+
+class CheckAdapter(HTTPAdapter):
+    # Connections record DNS, connect, TLS, time to first byte and bytes
+    # received into the PhaseTimer of the running check and are registered
+    # with its Deadline. With a resolver, connects to the addresses from the
+    # resolver cache, falling back to the next one when a connect fails; Host
+    # header, SNI and certificate checks still use the hostname. With a
+    # canceller, every connection is registered before it starts connecting
+    # so the run can be aborted from another thread.
+    def __init__(self, resolver=None, canceller=None, *args, **kwargs):
+        self._resolver = resolver
+        self._canceller = canceller
+        super(CheckAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(CheckAdapter, self).init_poolmanager(*args, **kwargs)
+        resolver = self._resolver
+        canceller = self._canceller
+
+        def connection_class(base, tls):
+            class Connection(base):
+                def _new_conn(self):
+                    addresses = None
+                    if resolver is not None:
+                        with phase("dns"):
+                            addresses = resolver.resolve(self.host)
+                    if canceller is not None:
+                        canceller.add(self)
+                    register(self)
+                    try:
+                        return connect_socket(self, (self._dns_host, self.port), addresses)
+                    except socket.gaierror as e:
+                        raise NameResolutionError(self.host, self, e)
+                    except socket.timeout:
+                        raise ConnectTimeoutError(self, "Connection to {} timed out. (connect timeout={})".format(
+                            self.host, self.timeout))
+                    except OSError as e:
+                        raise NewConnectionError(self, "Failed to establish a new connection: {}".format(e))
+                    finally:
+                        self.connecting_sock = None
+                        self._connected_at = perf_counter()
+
+                def connect(self):
+                    self._connected_at = None
+                    try:
+                        super(Connection, self).connect()
+                    finally:
+                        if tls and self._connected_at is not None:
+                            record("tls", perf_counter() - self._connected_at)
+
+                def request(self, *args, **kwargs):
+                    # a pooled connection is reused by later checks
+                    register(self)
+                    return super(Connection, self).request(*args, **kwargs)
+
+                def getresponse(self, *args, **kwargs):
+                    with phase("ttfb"):
+                        response = super(Connection, self).getresponse(*args, **kwargs)
+                    record_response(response)
+                    return response
+            Connection.__name__ = base.__name__
+            return Connection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("HTTPConnectionPool", (HTTPConnectionPool,),
+                {"ConnectionCls": connection_class(HTTPConnection, False)}),
+            "https": type("HTTPSConnectionPool", (HTTPSConnectionPool,),
+                {"ConnectionCls": connection_class(HTTPSConnection, True)}),
+        }
+
+def connect_socket(connection, address, addresses=None):
+    # urllib3.util.connection.create_connection, except that the socket is
+    # published on the connection before connect() blocks; resolved
+    # (family, ip) addresses replace the getaddrinfo() call
+    host, port = address
+    error = None
+    if addresses:
+        infos = [(family, socket.SOCK_STREAM, 0, "", (ip, port)) for family, ip in addresses]
+    else:
+        with phase("dns"):
+            infos = socket.getaddrinfo(host.strip("[]"), port, allowed_gai_family(), socket.SOCK_STREAM)
+    for family, socktype, proto, _, sa in infos:
+        sock = socket.socket(family, socktype, proto)
+        connection.connecting_sock = sock
+        try:
+            for option in connection.socket_options or ():
+                sock.setsockopt(*option)
+            if connection.timeout is not _DEFAULT_TIMEOUT:
+                sock.settimeout(connection.timeout)
+            if connection.source_address:
+                sock.bind(connection.source_address)
+            with phase("connect"):
+                sock.connect(sa)
+            return sock
+        except OSError as e:
+            error = e
+            sock.close()
+    raise error or OSError("getaddrinfo returns an empty list")
@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import sqlite3
+import threading
+from time import time
+
+from .conf import VALIDATORS
+from .utils import normalize_url
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_CHUNK = 900
+
+class ResultCache(object):
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                url TEXT PRIMARY KEY,
+                result INTEGER,
+                status_code INTEGER,
+                msg TEXT,
+                checked_at REAL
+            )""")
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(results)")]
+        for column in VALIDATORS:
+            if column not in columns:
+                self._connection.execute("ALTER TABLE results ADD COLUMN {} TEXT".format(column))
+        self._connection.commit()
+
+    def fresh(self, urls, max_age):
+        # Returns {url: (result, status_code, msg)} for urls checked within max_age seconds
+        found = {}
+        rows = self._lookup(urls, "result, status_code, msg", "checked_at >= ?", [time() - max_age])
+        for url, (result, status_code, msg) in rows:
+            found[url] = (bool(result), status_code, msg)
+        return found
+
+    def validators(self, urls):
+        # Returns {url: {"etag": ..., "last_modified": ...}} for urls with stored validators
+        found = {}
+        rows = self._lookup(urls, ", ".join(VALIDATORS), " OR ".join(
+            "{} IS NOT NULL".format(column) for column in VALIDATORS), [])
+        for url, values in rows:
+            found[url] = {column: value for column, value in zip(VALIDATORS, values) if value}
+        return found
+
+    def lookup(self, urls, max_age=0, conditional=False, skip=()):
+        # Both lookups a run starts with: fresh results, and validators for
+        # the urls that still need checking (None when not conditional)
+        cached = self.fresh(urls, max_age) if max_age else {}
+        validators = None
+        if conditional:
+            validators = self.validators(url for url in urls if url not in cached and url not in skip)
+        return cached, validators
+
+    def _lookup(self, urls, columns, where, params):
+        keys = {}
+        for url in urls:
+            keys.setdefault(normalize_url(url), []).append(url)
+        unique = list(keys)
+        found = []
+        with self._lock:
+            for i in range(0, len(unique), LOOKUP_CHUNK):
+                chunk = unique[i:i + LOOKUP_CHUNK]
+                rows = self._connection.execute(
+                    "SELECT url, {} FROM results WHERE ({}) AND url IN ({})".format(
+                        columns, where, ",".join("?" * len(chunk))),
+                    params + chunk).fetchall()
+                for row in rows:
+                    for url in keys[row[0]]:
+                        found.append((url, row[1:]))
+        return found
+
+    def put_many(self, results):
+        now = time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results (url, result, status_code, msg, checked_at, {}) "
+                "VALUES (?, ?, ?, ?, ?, {})".format(", ".join(VALIDATORS), ", ".join("?" * len(VALIDATORS))),
+                [(normalize_url(r["url"]), int(r["result"]), r["status_code"], r["msg"], now)
+                    + tuple(r.get(column) if r["result"] else None for column in VALIDATORS) for r in results])
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
\ No newline at end of file
@@ -0,0 +1,51 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import socket
+import threading
+import weakref
+
+class Canceller(object):
+    # Lets another thread abort a run. Connections registered here get their
+    # socket shut down, which wakes a blocked connect() or recv() at once
+    # instead of waiting for the timeout.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+        self._callbacks = []
+        self.cancelled = False
+
+    def add(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+        if self.cancelled:
+            shutdown_connection(connection)
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            connections = list(self._connections)
+            callbacks, self._callbacks = self._callbacks, []
+        for connection in connections:
+            shutdown_connection(connection)
+        for callback in callbacks:
+            callback()
+
+def shutdown_connection(connection):
+    # _socket.socket.shutdown acts on the file descriptor and skips the TLS
+    # close_notify of SSLSocket.shutdown, which would race with the reader
+    for sock in (getattr(connection, "sock", None), getattr(connection, "connecting_sock", None)):
+        if sock is not None:
+            try:
+                socket.socket.shutdown(sock, socket.SHUT_RDWR)
+            except (OSError, ValueError):
+                pass
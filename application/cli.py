@@ -0,0 +1,234 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# Headless checker, usable without a display and without PyQt5:
+#
+#   python -m application.cli urls.txt -f csv -o results.csv
+
+import argparse
+import os
+import sys
+import threading
+from functools import partial
+from time import time
+
+from .cache import ResultCache
+from .cancel import Canceller
+from .conf import __title__
+from .content import ContentPool, parse_keywords
+from .defaults import (CACHE_MAX_AGE, CONCURRENCY, CONDITIONAL, CONNECT_TIMEOUT, DEADLINE, ENGINE, HOST_LIMIT,
+    METRICS_HOST, PRE_RESOLVE, PROBE, THREADS, TIMEOUT)
+from .engine import AsyncChecker, HostScheduler, check_alive_async, check_queue
+from .exporters import WRITERS, open_output, result_row
+from .journal import Journal, load_journal
+from .limiter import AdaptiveLimiter
+from .metrics import RunStats
+from .openmetrics import MetricsServer
+from .resolver import Resolver
+from .utils import PROBES, check_alive, parse_codes
+from .version import __version__
+
+# results are written to the cache and journal in batches of this size
+BATCH_SIZE = 500
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m application.cli",
+        description="{} {} (headless)".format(__title__, __version__))
+    parser.add_argument("urls", help="file with one url per line, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, gzip compressed if it ends with .gz, - for stdout")
+    parser.add_argument("-f", "--format", choices=sorted(WRITERS), default="text")
+    parser.add_argument("-e", "--engine", choices=["threads", "asyncio"], default=ENGINE)
+    parser.add_argument("-t", "--threads", type=int, default=THREADS)
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--adaptive", action="store_true",
+        help="treat --threads/--concurrency as a maximum and adapt to throughput and error rate")
+    parser.add_argument("--host-limit", type=int, default=HOST_LIMIT, help="max requests in flight per host")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+        help="seconds to wait for a host to accept the connection")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="read timeout in seconds")
+    parser.add_argument("--deadline", type=float, default=DEADLINE,
+        help="hard limit in seconds per url, redirects and fallback included, 0 for none")
+    parser.add_argument("-p", "--probe", choices=list(PROBES), default=PROBE)
+    parser.add_argument("--fallback", default="", help="status codes that trigger the GET fallback, e.g. 403,405,501")
+    parser.add_argument("--no-resolve", dest="resolve", action="store_false", default=PRE_RESOLVE,
+        help="do not resolve host names up front")
+    parser.add_argument("--cache", help="SQLite result cache to read and update")
+    parser.add_argument("--max-age", type=int, default=CACHE_MAX_AGE,
+        help="reuse cached results younger than this many minutes")
+    parser.add_argument("--no-conditional", dest="conditional", action="store_false", default=CONDITIONAL,
+        help="do not send ETag/Last-Modified validators stored in the cache")
+    parser.add_argument("--journal", help="append every result to this JSON Lines file as soon as it is known")
+    parser.add_argument("--resume", action="store_true",
+        help="skip urls already recorded in the --journal file of an interrupted run")
+    parser.add_argument("--content", action="store_true",
+        help="download alive pages and extract title/keywords in worker processes")
+    parser.add_argument("-k", "--keywords", default="", help="comma separated keywords that must appear on the page")
+    parser.add_argument("--timings", action="store_true",
+        help="print DNS/connect/TLS/TTFB/total histograms of the run to stderr")
+    parser.add_argument("--metrics-port", type=int,
+        help="serve Prometheus/OpenMetrics metrics of the run on this port while checking")
+    parser.add_argument("--metrics-host", default=METRICS_HOST, help="address for --metrics-port to listen on")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print summary to stderr")
+    args = parser.parse_args(argv)
+    if args.resume and not args.journal:
+        parser.error("--resume needs --journal")
+    return args
+
+def read_urls(f):
+    for line in f:
+        # lstrip drops the BOM a file saved as "UTF-8 with BOM" starts with
+        url = line.strip().lstrip("\ufeff")
+        if url:
+            yield url
+
+def open_file(path, mode):
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    if "w" in mode:
+        return open_output(path)
+    return open(path, mode)
+
+def run(args):
+    stats = RunStats()
+    scheduler = HostScheduler(args.host_limit)
+    metrics = None
+    if args.metrics_port:
+        try:
+            metrics = MetricsServer(lambda: (stats, len(scheduler)), args.metrics_port, args.metrics_host).start()
+        except OSError as e:
+            sys.stderr.write("Can not serve metrics on {}:{}: {}\n".format(args.metrics_host, args.metrics_port, e))
+            return 1
+    with open_file(args.urls, "r") as f:
+        urls = list(read_urls(f))
+    cache = ResultCache(args.cache) if args.cache else None
+    cached = cache.fresh(urls, args.max_age * 60) if cache and args.max_age else {}
+    done = load_journal(args.journal) if args.resume and os.path.isfile(args.journal) else {}
+    resumed = 0
+    journal = Journal(args.journal) if args.journal else None
+    counts = {True: 0, False: 0}
+    lock = threading.Lock()
+    pending = []
+    out = open_file(args.output, "w")
+    # a gzip flush ends the compression block, so compressed output is only
+    # flushed once per batch
+    compressed = args.output.endswith(".gz")
+    writer = WRITERS[args.format](out)
+    for row, url in enumerate(urls):
+        if url in done:
+            record = done[url]
+            resumed += 1
+            counts[record["result"]] += 1
+            writer.write(result_row(record))
+        elif url in cached:
+            result, status_code, msg = cached[url]
+            counts[result] += 1
+            result = {"row": row, "url": url, "result": result, "status_code": status_code, "msg": msg}
+            writer.write(result_row(result))
+            pending.append(result)
+        else:
+            scheduler.put(row, url)
+    if journal is not None:
+        journal.write_many(pending)
+    del pending[:]
+    validators = None
+    if cache is not None and args.conditional:
+        validators = cache.validators(url for url in urls if url not in cached)
+    total = len(urls)
+    stats.total = len(scheduler)
+    del urls
+
+    def flush_pending():
+        if cache is not None:
+            cache.put_many(pending)
+        if journal is not None:
+            journal.write_many(pending)
+        del pending[:]
+
+    def on_result(result):
+        with lock:
+            counts[result["result"]] += 1
+            writer.write(result_row(result))
+            if not compressed or not sum(counts.values()) % BATCH_SIZE:
+                out.flush()
+            if cache is not None or journal is not None:
+                pending.append(result)
+                if len(pending) >= BATCH_SIZE:
+                    flush_pending()
+
+    fallback = parse_codes(args.fallback)
+    timeout = (args.connect_timeout, args.timeout)
+    started = time()
+    resolver = None
+    if args.resolve:
+        resolver = Resolver()
+        resolver.resolve_all(scheduler.hosts())
+    canceller = Canceller()
+    running = lambda: not canceller.cancelled
+    options = {
+        "resolver": resolver,
+        "validators": validators,
+        "content_pool": ContentPool() if args.content else None,
+        "keywords": parse_keywords(args.keywords),
+        "canceller": canceller,
+        "limiter": None,
+        "stats": stats,
+    }
+    if args.adaptive:
+        options["limiter"] = AdaptiveLimiter(args.concurrency if args.engine == "asyncio" else args.threads)
+    if args.engine == "asyncio":
+        check = partial(check_alive_async, probe=args.probe, fallback=fallback, content=args.content,
+            deadline=args.deadline)
+        checker = AsyncChecker(check, concurrency=args.concurrency, timeout=timeout, **options)
+        threads = [threading.Thread(target=checker.run, args=(scheduler, lambda row, status: None, on_result, running))]
+    else:
+        check = partial(check_alive, probe=args.probe, fallback=fallback, content=args.content,
+            deadline=args.deadline)
+        threads = [
+            threading.Thread(target=check_queue,
+                args=(scheduler, check, timeout, lambda row, status: None, on_result, running),
+                kwargs=options)
+            for _ in range(args.threads)
+        ]
+    for thread in threads:
+        thread.start()
+    interrupted = False
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        # abort the requests in flight and keep what is already done
+        interrupted = True
+        canceller.cancel()
+        scheduler.clear()
+        if options["limiter"] is not None:
+            options["limiter"].wake()
+        for thread in threads:
+            thread.join()
+    if options["content_pool"] is not None:
+        options["content_pool"].shutdown()
+    if metrics is not None:
+        metrics.stop()
+    writer.close()
+    flush_pending()
+    if cache is not None:
+        cache.close()
+    if journal is not None:
+        journal.close()
+    if out is not sys.stdout:
+        out.close()
+    if not args.quiet:
+        sys.stderr.write("Checked {} of {} urls ({} cached, {} resumed) in {:.1f}s: {} OK, {} failed{}\n".format(
+            counts[True] + counts[False], total, len(cached), resumed, time() - started, counts[True],
+            counts[False], ", interrupted" if interrupted else ""))
+    if args.timings:
+        sys.stderr.write(stats.report() + "\n")
+    return 130 if interrupted else 0
+
+def main(argv=None):
+    try:
+        return run(parse_args(argv))
+    except KeyboardInterrupt:
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -12,4 +12,10 @@ ROOT = str(Path(os.path.realpath(os.path.dirname(__file__))).parent)
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 6.1; rv:52.0) Gecko/20100101 Firefox/52.0",
     "Accept-Language": "en-US,en;q=0.5",
+}
+RANGE = "bytes=0-0"
+# validator: (response header, conditional request header)
+VALIDATORS = {
+    "etag": ("ETag", "If-None-Match"),
+    "last_modified": ("Last-Modified", "If-Modified-Since"),
 }
\ No newline at end of file
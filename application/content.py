@@ -0,0 +1,49 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import lxml.html
+from lxml import etree
+
+KEYWORD_ERROR = "Keyword not found"
+
+def parse_content(body, keywords=()):
+    # Runs in a worker process, keep the return value small
+    title = None
+    try:
+        document = lxml.html.fromstring(body)
+        title = document.findtext(".//title")
+        text = document.text_content()
+    except (ValueError, etree.ParserError):
+        text = body.decode("utf-8", "replace")
+    found = None
+    if keywords:
+        text = text.lower()
+        found = all(keyword.lower() in text for keyword in keywords)
+    return {
+        "title": " ".join(title.split()) if title else None,
+        "keyword_found": found,
+    }
+
+def apply_content(result, content):
+    result.update(content)
+    if content["keyword_found"] is False and result["result"]:
+        result["result"] = False
+        result["msg"] = KEYWORD_ERROR
+    return result
+
+def parse_keywords(text):
+    return tuple(keyword.strip() for keyword in text.split(",") if keyword.strip())
+
+class ContentPool(object):
+    def __init__(self, workers=None):
+        # spawn, forking a process that runs Qt or network threads is unsafe
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, body, keywords=()):
+        return self._executor.submit(parse_content, body, keywords)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
\ No newline at end of file
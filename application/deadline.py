@@ -0,0 +1,90 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import heapq
+import threading
+import weakref
+from contextvars import ContextVar
+from itertools import count
+from time import monotonic
+
+from .cancel import shutdown_connection
+
+# the deadline of the check running in this thread
+_deadline = ContextVar("deadline", default=None)
+
+class Deadline(object):
+    # Time limit for a whole check, redirects and fallback requests included.
+    # Connections the check uses are registered here and shut down when the
+    # time is up, which makes the blocked request fail at once. No limit when
+    # seconds is 0 or None.
+    def __init__(self, seconds, watchdog=None):
+        self.seconds = seconds
+        self.at = None
+        self.expired = False
+        self._watchdog = watchdog or WATCHDOG
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._done = False
+        self._token = None
+
+    def __enter__(self):
+        self._token = _deadline.set(self)
+        if self.seconds:
+            self.at = monotonic() + self.seconds
+            self._watchdog.watch(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self._done = True
+            self._connections.clear()
+        _deadline.reset(self._token)
+
+    def add(self, connection):
+        with self._lock:
+            if not self.expired:
+                self._connections.add(connection)
+                return
+        shutdown_connection(connection)
+
+    def expire(self):
+        with self._lock:
+            if self._done:
+                return
+            self.expired = True
+            connections = list(self._connections)
+        for connection in connections:
+            shutdown_connection(connection)
+
+class Watchdog(object):
+    # one thread expiring the deadlines of every check in the process
+    def __init__(self):
+        self._heap = []
+        self._order = count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, deadline):
+        with self._condition:
+            heapq.heappush(self._heap, (deadline.at, next(self._order), deadline))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="deadline-watchdog", daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is deadline:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > monotonic():
+                    self._condition.wait(self._heap[0][0] - monotonic() if self._heap else None)
+                deadline = heapq.heappop(self._heap)[2]
+            deadline.expire()
+
+WATCHDOG = Watchdog()
+
+def register(connection):
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.add(connection)
@@ -2,4 +2,33 @@
 #!/usr/bin/env python
 
 THREADS = 1
-TIMEOUT = 5
\ No newline at end of file
+TIMEOUT = 5
+CONNECT_TIMEOUT = 3
+DEADLINE = 15
+ENGINE = "threads"
+CONCURRENCY = 100
+POOL_CONNECTIONS = 100
+POOL_MAXSIZE = 10
+IMPORT_CHUNK = 10000
+FLUSH_INTERVAL = 100
+PROBE = "head_get"
+FALLBACK_CODES = None
+HOST_LIMIT = 4
+PRE_RESOLVE = True
+DNS_TTL = 300
+DNS_NEGATIVE_TTL = 60
+DNS_WORKERS = 64
+CACHE_MAX_AGE = 0
+CONDITIONAL = True
+CONTENT_CHECK = False
+MAX_CONTENT = 512 * 1024
+JOURNAL = True
+ADAPTIVE = False
+ADAPTIVE_START = 4
+ADAPTIVE_WINDOW = 1.0
+ADAPTIVE_MIN_SAMPLES = 5
+ADAPTIVE_ERROR_SPIKE = 0.1
+RATE_WINDOW = 10
+METRICS = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
\ No newline at end of file
@@ -0,0 +1,450 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import asyncio
+import socket
+import threading
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from time import perf_counter
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from .conf import HEADERS, RANGE
+from .content import apply_content, parse_content
+from .defaults import CONCURRENCY, DEADLINE, FALLBACK_CODES, HOST_LIMIT, MAX_CONTENT, PROBE, TIMEOUT
+from .resolver import DNS_ERROR
+from .timing import PHASES, PhaseTimer, header_size, record, record_bytes
+from .utils import (conditional_headers, create_session, deadline_message, has_content, make_result,
+    needs_fallback, ranged_status, response_validators, split_timeout, url_host)
+
+async def probe_head_async(session, url, timeout, headers, content=False):
+    async with session.head(url, headers=headers, allow_redirects=True, timeout=timeout) as r:
+        return r.status, r.headers, None
+
+async def probe_get_async(session, url, timeout, headers, content=False):
+    async with session.get(url, headers=headers, allow_redirects=True, timeout=timeout) as r:
+        body = await r.read()
+        return r.status, r.headers, body[:MAX_CONTENT] if content and has_content(r.status) else None
+
+async def probe_range_async(session, url, timeout, headers, content=False):
+    async with session.get(url, headers=dict(headers, Range=RANGE), allow_redirects=True, timeout=timeout) as r:
+        return ranged_status(r.status), r.headers, None
+
+async def probe_stream_async(session, url, timeout, headers, content=False):
+    async with session.get(url, headers=headers, allow_redirects=True, timeout=timeout) as r:
+        body = await r.content.read(MAX_CONTENT) if content and has_content(r.status) else None
+        return r.status, r.headers, body
+
+ASYNC_PROBES = {
+    "head_get": (probe_head_async, probe_get_async),
+    "head": (probe_head_async, None),
+    "head_range": (probe_head_async, probe_range_async),
+    "stream": (probe_stream_async, None),
+}
+
+async def read_body_async(session, url, timeout, limit=MAX_CONTENT):
+    async with session.get(url, allow_redirects=True, timeout=timeout) as r:
+        return await r.content.read(limit)
+
+async def check_alive_async(session, url, timeout=TIMEOUT, probe=PROBE, fallback=FALLBACK_CODES, validators=None,
+        content=False, deadline=DEADLINE):
+    info = dict(validators or {})
+    # the session already sends HEADERS, only add the conditional ones
+    headers = conditional_headers(validators, {})
+    connect_timeout, read_timeout = split_timeout(timeout)
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+    first, then = ASYNC_PROBES[probe]
+    status_code = None
+
+    async def check():
+        nonlocal status_code
+        try:
+            status_code, response_headers, body = await first(session, url, client_timeout, headers, content)
+            if then is not None and needs_fallback(status_code, fallback):
+                status_code, response_headers, body = await then(session, url, client_timeout, headers, content)
+            info.update(response_validators(response_headers))
+            if content and has_content(status_code):
+                if body is None:
+                    body = await read_body_async(session, url, client_timeout)
+                info["body"] = body
+        except asyncio.TimeoutError as e:
+            info["error"] = "timeout"
+            return str(e) or "Timed out"
+        except Exception as e:
+            if is_dns_error(e):
+                info["error"] = "dns"
+            return str(e) or e.__class__.__name__
+        return ''
+
+    with PhaseTimer(ASYNC_PHASES) as timer:
+        try:
+            # anything timing out here is the deadline, check() handles its own timeouts
+            msg = await asyncio.wait_for(check(), deadline or None)
+        except asyncio.TimeoutError:
+            msg = deadline_message(deadline)
+            info["error"] = "timeout"
+    info.update(timer.timings())
+    info["bytes"] = timer.received
+    return status_code, msg, info
+
+# aiohttp before 3.11 reports resolver errors as a plain ClientConnectorError
+DNS_ERROR_TYPE = getattr(aiohttp, "ClientConnectorDNSError", None)
+
+def is_dns_error(error):
+    if DNS_ERROR_TYPE is not None:
+        return isinstance(error, DNS_ERROR_TYPE)
+    return isinstance(error, aiohttp.ClientConnectorError) and isinstance(error.os_error, socket.gaierror)
+
+# aiohttp opens the socket and does the TLS handshake in one call, so the
+# handshake is counted in connect and tls is not reported
+ASYNC_PHASES = [phase for phase in PHASES if phase != "tls"]
+
+def timing_trace():
+    # reports phases and bytes received to the PhaseTimer of the check that
+    # made the request
+    async def on_request_start(session, ctx, params):
+        ctx.dns = 0.0
+        ctx.resolving = ctx.connecting = ctx.sent = None
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.resolving = perf_counter()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        elapsed = perf_counter() - ctx.resolving
+        ctx.resolving = None
+        ctx.dns += elapsed
+        record("dns", elapsed)
+
+    async def on_connection_create_start(session, ctx, params):
+        # name resolution happens inside connection creation
+        ctx.connecting = (perf_counter(), ctx.dns)
+
+    async def on_connection_create_end(session, ctx, params):
+        started, dns = ctx.connecting
+        ctx.connecting = None
+        record("connect", perf_counter() - started - (ctx.dns - dns))
+
+    async def on_request_headers_sent(session, ctx, params):
+        ctx.sent = perf_counter()
+
+    def first_byte(ctx):
+        if ctx.sent is not None:
+            record("ttfb", perf_counter() - ctx.sent)
+            ctx.sent = None
+
+    async def on_response(session, ctx, params):
+        first_byte(ctx)
+        record_bytes(header_size(params.response.raw_headers))
+
+    async def on_response_chunk_received(session, ctx, params):
+        record_bytes(len(params.chunk))
+
+    async def on_request_exception(session, ctx, params):
+        if ctx.resolving is not None:
+            await on_dns_resolvehost_end(session, ctx, params)
+        if ctx.connecting is not None:
+            await on_connection_create_end(session, ctx, params)
+        first_byte(ctx)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_request_headers_sent.append(on_request_headers_sent)
+    trace.on_request_redirect.append(on_response)
+    trace.on_request_end.append(on_response)
+    trace.on_response_chunk_received.append(on_response_chunk_received)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+
+class CachedResolver(AbstractResolver):
+    def __init__(self, resolver):
+        self._resolver = resolver
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        addresses = self._resolver.cached(host)
+        if addresses is None:
+            addresses = await asyncio.get_event_loop().run_in_executor(None, self._resolver.resolve, host)
+        if not addresses:
+            raise OSError(DNS_ERROR)
+        flags = socket.AI_NUMERICHOST | socket.AI_NUMERICSERV
+        return [
+            {"hostname": host, "host": address, "port": port, "family": address_family, "proto": 0, "flags": flags}
+            for address_family, address in addresses
+            if family == socket.AF_UNSPEC or address_family == family
+        ]
+
+    async def close(self):
+        pass
+
+
+class HostScheduler(object):
+    def __init__(self, host_limit=HOST_LIMIT):
+        self._host_limit = host_limit
+        self._pending = {}
+        self._inflight = {}
+        self._ready = deque()
+        self._queued = 0
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return self._queued
+
+    def put(self, row, url):
+        host = url_host(url)
+        with self._condition:
+            if host not in self._pending:
+                self._pending[host] = deque()
+                self._inflight.setdefault(host, 0)
+            if not self._pending[host] and self._inflight[host] < self._host_limit:
+                self._ready.append(host)
+            self._pending[host].append((row, url))
+            self._queued += 1
+            self._condition.notify()
+
+    def hosts(self):
+        with self._condition:
+            return list(self._pending)
+
+    def take(self):
+        with self._condition:
+            return self._take()
+
+    def _take(self):
+        if not self._ready:
+            return None
+        host = self._ready.popleft()
+        item = self._pending[host].popleft()
+        self._queued -= 1
+        self._inflight[host] += 1
+        if self._pending[host]:
+            if self._inflight[host] < self._host_limit:
+                self._ready.append(host)
+        else:
+            del self._pending[host]
+        return item
+
+    def get(self, running=lambda: True):
+        with self._condition:
+            while running():
+                item = self._take()
+                if item is not None or not self._queued:
+                    return item
+                self._condition.wait(0.5)
+        return None
+
+    def clear(self):
+        # drops everything not yet taken, returns how many items that was
+        with self._condition:
+            dropped = self._queued
+            self._pending.clear()
+            self._ready.clear()
+            self._queued = 0
+            self._condition.notify_all()
+            return dropped
+
+    def done(self, url):
+        host = url_host(url)
+        with self._condition:
+            self._inflight[host] -= 1
+            if host in self._pending and self._inflight[host] == self._host_limit - 1:
+                self._ready.append(host)
+            self._condition.notify()
+
+
+def check_queue(scheduler, check, timeout, on_status, on_result, running=lambda: True, resolver=None,
+        validators=None, content_pool=None, keywords=(), canceller=None, limiter=None, stats=None):
+    parsing = []
+    parsed = threading.Semaphore(0)
+    if stats is not None:
+        on_result = stats.counted(on_result)
+    with create_session(resolver=resolver, canceller=canceller) as session:
+        while running():
+            if limiter is not None and not limiter.acquire(running):
+                break
+            item = scheduler.get(running)
+            if item is None:
+                if limiter is not None:
+                    limiter.release()
+                break
+            row, url = item
+            if stats is not None:
+                stats.checking()
+            try:
+                on_status(row, "Checking ...")
+                if resolver is not None and resolver.failed(url_host(url)):
+                    status_code, msg, info = None, DNS_ERROR, {"error": "dns"}
+                else:
+                    status_code, msg, info = check(url, timeout, session=session,
+                        validators=validators.get(url) if validators else None)
+                if status_code is None and canceller is not None and canceller.cancelled:
+                    # aborted, not a failure of the site
+                    on_status(row, "")
+                    if stats is not None:
+                        stats.aborted()
+                    continue
+                if limiter is not None and msg != DNS_ERROR:
+                    # a host that did not resolve was skipped without a request,
+                    # it says nothing about load, same as in AsyncChecker
+                    limiter.record(status_code is not None)
+                result = make_result(row, url, status_code, msg, info)
+                body = result.pop("body", None)
+                if body is None:
+                    on_result(result)
+                    on_status(row, "Done")
+                elif content_pool is None:
+                    on_result(apply_content(result, parse_content(body, keywords)))
+                    on_status(row, "Done")
+                else:
+                    on_status(row, "Parsing ...")
+                    try:
+                        future = content_pool.submit(body, keywords)
+                    except BrokenProcessPool:
+                        on_result(apply_content(result, parse_content(body, keywords)))
+                        on_status(row, "Done")
+                    else:
+                        future.add_done_callback(partial(on_parsed, result, on_status, on_result, stats, parsed))
+                        parsing.append(future)
+            finally:
+                scheduler.done(url)
+                if limiter is not None:
+                    limiter.release()
+    if canceller is not None and canceller.cancelled:
+        for future in parsing:
+            future.cancel()
+    # wait for the callbacks, not the futures: a future counts as done
+    # before its callbacks have run
+    for _ in parsing:
+        parsed.acquire()
+
+def on_parsed(result, on_status, on_result, stats, parsed, future):
+    try:
+        if future.cancelled():
+            on_status(result["row"], "")
+            if stats is not None:
+                stats.aborted()
+            return
+        try:
+            result = apply_content(result, future.result())
+        except Exception as e:
+            result["msg"] = str(e) or e.__class__.__name__
+        on_result(result)
+        on_status(result["row"], "Done")
+    finally:
+        parsed.release()
+
+
+class AsyncChecker(object):
+    def __init__(self, check=check_alive_async, concurrency=CONCURRENCY, timeout=TIMEOUT, resolver=None,
+            validators=None, content_pool=None, keywords=(), canceller=None, limiter=None, stats=None):
+        self._check_func = check
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._resolver = resolver
+        self._validators = validators or {}
+        self._content_pool = content_pool
+        self._keywords = keywords
+        self._canceller = canceller
+        self._limiter = limiter
+        self._stats = stats
+
+    def run(self, scheduler, on_status, on_result, running=lambda: True):
+        if self._stats is not None:
+            on_result = self._stats.counted(on_result)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run(scheduler, on_status, on_result, running))
+        finally:
+            loop.close()
+
+    async def _run(self, scheduler, on_status, on_result, running):
+        semaphore = asyncio.Semaphore(self._concurrency)
+        if self._resolver is not None:
+            connector = aiohttp.TCPConnector(limit=self._concurrency, use_dns_cache=False,
+                resolver=CachedResolver(self._resolver))
+        else:
+            connector = aiohttp.TCPConnector(limit=self._concurrency, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(headers=HEADERS, connector=connector,
+                trace_configs=[timing_trace()]) as session:
+            tasks = set()
+            if self._canceller is not None:
+                self._canceller.on_cancel(partial(cancel_tasks, asyncio.get_event_loop(), tasks))
+            while True:
+                await semaphore.acquire()
+                while self._limiter is not None and len(tasks) >= self._limiter.limit:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                item = scheduler.take() if running() else None
+                if item is None:
+                    semaphore.release()
+                    if not tasks or not running():
+                        break
+                    # every pending host is at its limit, wait for a slot
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                row, url = item
+                task = asyncio.ensure_future(self._check(session, row, url, on_status, on_result))
+                task.add_done_callback(lambda t, url=url: (semaphore.release(), scheduler.done(url)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _check(self, session, row, url, on_status, on_result):
+        if self._stats is not None:
+            self._stats.checking()
+        try:
+            await self._check_url(session, row, url, on_status, on_result)
+        except asyncio.CancelledError:
+            on_status(row, "")
+            if self._stats is not None:
+                self._stats.aborted()
+            raise
+
+    async def _check_url(self, session, row, url, on_status, on_result):
+        on_status(row, "Checking ...")
+        if await self._dns_failed(url_host(url)):
+            status_code, msg, info = None, DNS_ERROR, {"error": "dns"}
+        else:
+            status_code, msg, info = await self._check_func(session, url, self._timeout,
+                validators=self._validators.get(url))
+            if self._limiter is not None:
+                self._limiter.record(status_code is not None)
+        result = make_result(row, url, status_code, msg, info)
+        body = result.pop("body", None)
+        if body is not None:
+            if self._content_pool is None:
+                content = parse_content(body, self._keywords)
+            else:
+                on_status(row, "Parsing ...")
+                try:
+                    content = await asyncio.wrap_future(self._content_pool.submit(body, self._keywords))
+                except Exception as e:
+                    content = {"title": None, "keyword_found": None}
+                    result["msg"] = str(e) or e.__class__.__name__
+            apply_content(result, content)
+        on_result(result)
+        on_status(row, "Done")
+
+    async def _dns_failed(self, host):
+        if self._resolver is None or not host:
+            return False
+        addresses = self._resolver.cached(host)
+        if addresses is None:
+            addresses = await asyncio.get_event_loop().run_in_executor(None, self._resolver.resolve, host)
+        return not addresses
+
+def cancel_tasks(loop, tasks):
+    # called from another thread, the loop may already be gone
+    def cancel():
+        for task in list(tasks):
+            task.cancel()
+    try:
+        loop.call_soon_threadsafe(cancel)
+    except RuntimeError:
+        pass
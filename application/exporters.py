@@ -0,0 +1,89 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import csv
+import gzip
+import json
+
+from .timing import TIMING_FIELDS, TIMING_HEADERS
+
+FIELDS = ["URL", "Result", "Code", "Message", "Title"] + TIMING_HEADERS
+PROGRESS_STEP = 10000
+
+def result_row(result):
+    row = {
+        "URL": result["url"],
+        "Result": "OK" if result["result"] else "Fail",
+        "Code": result["status_code"],
+        "Message": result["msg"],
+        "Title": result.get("title"),
+    }
+    for header, field in zip(TIMING_HEADERS, TIMING_FIELDS):
+        row[header] = result.get(field)
+    return row
+
+class TextWriter(object):
+    def __init__(self, f, fields=FIELDS):
+        self._f = f
+        self._fields = fields
+
+    def write(self, row):
+        self._f.write("\t".join("" if row[k] is None else str(row[k]) for k in self._fields) + "\n")
+
+    def close(self):
+        pass
+
+class CsvWriter(TextWriter):
+    def __init__(self, f, fields=FIELDS):
+        super(CsvWriter, self).__init__(f, fields)
+        self._writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+class JsonLinesWriter(TextWriter):
+    def write(self, row):
+        self._f.write(json.dumps({k: row[k] for k in self._fields}) + "\n")
+
+class JsonWriter(TextWriter):
+    # a JSON array written one element at a time
+    def __init__(self, f, fields=FIELDS):
+        super(JsonWriter, self).__init__(f, fields)
+        self._separator = "[\n"
+
+    def write(self, row):
+        self._f.write(self._separator + json.dumps({k: row[k] for k in self._fields}))
+        self._separator = ",\n"
+
+    def close(self):
+        self._f.write("[]\n" if self._separator == "[\n" else "\n]\n")
+
+WRITERS = {
+    "text": TextWriter,
+    "csv": CsvWriter,
+    "json": JsonWriter,
+    "jsonl": JsonLinesWriter,
+}
+
+def open_output(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def export_rows(rows, path, format="csv", fields=FIELDS, total=0, on_progress=None, running=lambda: True):
+    count = 0
+    with open_output(path) as f:
+        writer = WRITERS[format](f, fields)
+        for row in rows:
+            if not count % PROGRESS_STEP:
+                if not running():
+                    break
+                if on_progress is not None and total:
+                    on_progress(count, total)
+            writer.write(row)
+            count += 1
+        writer.close()
+    if on_progress is not None and total:
+        on_progress(count, total)
+    return count
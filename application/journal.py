@@ -0,0 +1,55 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import json
+import os
+from time import strftime, time
+
+from .timing import TIMING_FIELDS
+
+JOURNAL_FIELDS = ["row", "url", "result", "status_code", "msg", "title"] + TIMING_FIELDS
+
+def journal_path(directory):
+    return os.path.join(directory, "run-{}.jsonl".format(strftime("%Y%m%d-%H%M%S")))
+
+class Journal(object):
+    # Append-only JSON Lines log of results, flushed after every batch so
+    # other processes can follow it while the run is going
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._f = open(path, "a", encoding="utf-8")
+        if self._f.tell():
+            # a crash may have left half a line behind, don't glue the next record to it
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._f.write("\n")
+
+    def write_many(self, results):
+        now = round(time(), 3)
+        for result in results:
+            record = {k: result.get(k) for k in JOURNAL_FIELDS}
+            record["logged_at"] = now
+            self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            os.fsync(self._f.fileno())
+            self._f.close()
+
+def load_journal(path):
+    # {url: record} of everything a previous run finished, the last record
+    # wins; a line cut short by a crash is skipped
+    done = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            done[record["url"]] = record
+    return done
@@ -0,0 +1,68 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import threading
+from time import monotonic
+
+from .defaults import ADAPTIVE_ERROR_SPIKE, ADAPTIVE_MIN_SAMPLES, ADAPTIVE_START, ADAPTIVE_WINDOW
+
+class AdaptiveLimiter(object):
+    # AIMD concurrency control. Once per window the limit grows by `step`
+    # while throughput keeps up, and is halved when the share of timeouts and
+    # connection errors jumps above its usual level, which points at local
+    # saturation (sockets, bandwidth, NAT table) rather than dead sites.
+    def __init__(self, maximum, start=ADAPTIVE_START, window=ADAPTIVE_WINDOW, spike=ADAPTIVE_ERROR_SPIKE):
+        self.maximum = maximum
+        self.limit = min(start, maximum)
+        self._step = max(1, maximum // 20)
+        self._window = window
+        self._spike = spike
+        self._condition = threading.Condition()
+        self._inflight = 0
+        self._done = 0
+        self._errors = 0
+        self._started = monotonic()
+        self._throughput = 0.0
+        self._baseline = None
+
+    def acquire(self, running=lambda: True):
+        with self._condition:
+            while self._inflight >= self.limit:
+                if not running():
+                    return False
+                self._condition.wait(0.5)
+            self._inflight += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._inflight -= 1
+            self._condition.notify()
+
+    def wake(self):
+        # lets threads waiting in acquire() notice that the run was stopped
+        with self._condition:
+            self._condition.notify_all()
+
+    def record(self, ok):
+        with self._condition:
+            self._done += 1
+            if not ok:
+                self._errors += 1
+            elapsed = monotonic() - self._started
+            if elapsed >= self._window and self._done >= ADAPTIVE_MIN_SAMPLES:
+                self._adjust(self._done / elapsed, float(self._errors) / self._done)
+                self._done = self._errors = 0
+                self._started = monotonic()
+                self._condition.notify_all()
+
+    def _adjust(self, throughput, error_rate):
+        if self._baseline is None:
+            self._baseline = error_rate
+        if error_rate > self._baseline + self._spike:
+            self.limit = max(1, self.limit // 2)
+        else:
+            self._baseline = 0.8 * self._baseline + 0.2 * error_rate
+            if throughput >= self._throughput * 0.9:
+                self.limit = min(self.maximum, self.limit + self._step)
+        self._throughput = throughput
@@ -1,28 +1,66 @@
 # -*- coding: UTF-8 -*-
 # !/usr/bin/env python
 
-import csv
-import json
+import html
 import os
 import platform
 import webbrowser
-from queue import Queue
+from collections import OrderedDict
+from functools import partial
 
 from PyQt5 import uic, QtWidgets
-from PyQt5.QtCore import (Qt, QSettings, QThread, QTimer, pyqtSlot, pyqtSignal,
-    QT_VERSION_STR, PYQT_VERSION_STR, QItemSelectionModel)
-from PyQt5.QtGui import (QFont, QStandardItem, QStandardItemModel)
+from PyQt5.QtCore import (QSettings, QThread, QTimer, pyqtSlot, pyqtSignal,
+    QT_VERSION_STR, PYQT_VERSION_STR, QItemSelection, QItemSelectionModel)
 
+from .cache import ResultCache
 from .conf import ROOT, __author__, __description__, __title__
-from .defaults import THREADS, TIMEOUT
-from .helpers import readTextFile, Logger
-from .utils import check_alive, split_list
+from .content import ContentPool, parse_keywords
+from .defaults import (ADAPTIVE, CACHE_MAX_AGE, CONCURRENCY, CONDITIONAL, CONNECT_TIMEOUT, CONTENT_CHECK, DEADLINE,
+    ENGINE, FLUSH_INTERVAL, HOST_LIMIT, IMPORT_CHUNK, JOURNAL, METRICS, METRICS_PORT, PRE_RESOLVE, PROBE, THREADS,
+    TIMEOUT)
+from .engine import HostScheduler, check_alive_async
+from .exporters import export_rows
+from .helpers import Logger
+from .journal import Journal, journal_path, load_journal
+from .limiter import AdaptiveLimiter
+from .metrics import RateMeter, RunStats, format_bytes, format_duration
+from .models import SitesModel
+from .openmetrics import MetricsServer
+from .resolver import Resolver
+from .timing import TIMING_FIELDS, TIMING_HEADERS
+from .utils import check_alive, normalize_url, parse_codes, unique_rows
 from .version import __version__
-from .workers import Worker, CheckAliveWorker, MyThread
+from .workers import (Worker, AsyncCheckAliveWorker, CheckAliveWorker, DedupWorker, ExportWorker, ImportUrlsWorker,
+    LookupWorker,
+    MyThread, ResolveWorker)
 
 
 ui = uic.loadUiType(os.path.join(ROOT, "assets", "ui", "mainwindow.ui"))[0]
 logger = Logger(__name__)
+ENGINES = ["threads", "asyncio"]
+PROBES = ["head_get", "head", "head_range", "stream"]
+EXPORT_FORMATS = OrderedDict([
+    ("Text file (*.txt)", "text"),
+    ("CSV file (*.csv)", "csv"),
+    ("JSON file (*.json)", "json"),
+    ("JSON Lines file (*.jsonl)", "jsonl"),
+    ("Compressed CSV file (*.csv.gz)", "csv"),
+    ("Compressed JSON Lines file (*.jsonl.gz)", "jsonl"),
+])
+EXPORT_FIELDS = ["URL", "Result", "Code", "Title"] + TIMING_HEADERS
+
+def rowUpdate(result):
+    return (result["row"], result["result"], result["status_code"], result.get("title"),
+        [result.get(field) for field in TIMING_FIELDS])
+
+def lookupRun(cache, journalPath, urls, maxAge, conditional):
+    # runs in a LookupWorker, the journal and the cache both take seconds on large lists
+    done = load_journal(journalPath) if journalPath else {}
+    if maxAge or conditional:
+        cached, validators = cache.lookup(urls, maxAge, conditional, set(done))
+    else:
+        cached, validators = {}, None
+    return done, cached, validators
 
 class MainWindow(QtWidgets.QMainWindow, ui):
     def __init__(self, parent=None):
@@ -30,17 +68,23 @@ class MainWindow(QtWidgets.QMainWindow, ui):
         self.setupUi(self)
         self.setWindowTitle("{} - {}".format(__title__, __version__))
         self._settingsFile = os.path.join(ROOT, "data", "settings.ini")
+        self._cache = ResultCache(os.path.join(ROOT, "data", "cache.sqlite"))
         self._threadPool = []
-        self.sitesModel = QStandardItemModel()
-        self.sitesModel.setHorizontalHeaderLabels(["URL", "Result", "Code", "Status"])
+        self.sitesModel = SitesModel(self)
         self.sitesTableView.setModel(self.sitesModel)
+        self.sitesModel.rowsInserted.connect(self.updateResumeButton)
+        self.sitesModel.rowsRemoved.connect(self.updateResumeButton)
+        self.sitesModel.modelReset.connect(self.updateResumeButton)
         self.importUrlsAction.triggered.connect(self.importUrls)
         self.exportResultsAction.triggered.connect(self.exportResults)
         self.quitAction.triggered.connect(lambda: QtWidgets.QApplication.quit())
         self.clearTableAction.triggered.connect(self.clearTable)
         self.aboutAction.triggered.connect(self.about)
         self.startButton.clicked.connect(self.start)
+        self.resumeButton.clicked.connect(self.resume)
         self.stopButton.clicked.connect(self.stop)
+        self.engineCombo.currentIndexChanged.connect(self.onEngineChanged)
+        self.metricsCheck.toggled.connect(self.onMetricsToggled)
         self.buttonTest.clicked.connect(self.test)
         self.sitesTableView.doubleClicked.connect(self.sitesTableView_doubleClicked)
         self.labelActiveThreads = QtWidgets.QLabel("Active threads: 0")
@@ -50,6 +94,8 @@ class MainWindow(QtWidgets.QMainWindow, ui):
         self.actionInvert_selection.triggered.connect(self.invertSelection)
         self.actionRemove_duplicates.triggered.connect(self.removeDuplicates)
         self.actionSelect_all.triggered.connect(self.sitesTableView.selectAll)
+        self.actionTimings.triggered.connect(self.showTimings)
+        self.menuView.addAction(self.metricsDock.toggleViewAction())
 
         # Events
         self.resizeEvent = self.onResize
@@ -59,25 +105,41 @@ class MainWindow(QtWidgets.QMainWindow, ui):
         self._threads = []
         self._activeThreads = 0
         self._workers = []
+        self._importThread = None
+        self._importWorker = None
+        self._dedupThread = None
+        self._dedupWorker = None
+        self._exportThread = None
+        self._exportWorker = None
+        self._scheduler = None
+        self._validators = None
+        self._contentPool = None
+        self._limiter = None
+        self._stats = RunStats()
+        self._rate = RateMeter()
+        self._journal = None
+        self._resumeJournal = None
+        self._metricsServer = None
+        self._lastJournal = None
+        self._resolver = Resolver()
+        self._stopping = False
         self._progressDone = 0
         self._progressTotal = 0
-        self._boldFont = QFont()
-        self._boldFont.setBold(True)
+        self._pendingStates = {}
+        self._pendingResults = []
         self._recentFIles = []
         self.loadSettings()
         self.centerWindow()
         self.timerPulse = QTimer(self)
         self.timerPulse.timeout.connect(self.pulse)
         self.timerPulse.start(1000)
-        # text = readTextFile("data/sites2.txt")
-        # for url in text.strip().splitlines():
-        #     resultCell = QStandardItem("")
-        #     # resultCell.setTextAlignment(Qt.AlignCeter)
-        #     codeCell = QStandardItem("")
-        #     # codeCell.setTextAlignment(Qt.AlignCenter)
-        #     self.sitesModel.appendRow([QStandardItem(url), resultCell, codeCell])
+        self.timerFlush = QTimer(self)
+        self.timerFlush.timeout.connect(self.flushResults)
+        self.timerFlush.start(FLUSH_INTERVAL)
         self.stopButton.setEnabled(False)
+        self.resumeButton.setEnabled(self.canResume())
         self.buttonTest.setVisible(False)
+        self.onEngineChanged(self.engineCombo.currentIndex())
 
     def centerWindow(self):
         fg = self.frameGeometry()
@@ -92,7 +154,25 @@ class MainWindow(QtWidgets.QMainWindow, ui):
             self.restoreState(settings.value("windowState", ''))
             self._tableViewWidth = int(settings.value("tableViewWidth", ''))
             self.threadsSpin.setValue(settings.value("threadsCount", THREADS, type=int))
-            self.timeoutSpin.setValue(settings.value("timeoutSpin", TIMEOUT, type=int))
+            self.connectTimeoutSpin.setValue(settings.value("connectTimeout", CONNECT_TIMEOUT, type=int))
+            self.timeoutSpin.setValue(settings.value("timeout", TIMEOUT, type=int))
+            self.deadlineSpin.setValue(settings.value("deadline", DEADLINE, type=int))
+            self.hostLimitSpin.setValue(settings.value("hostLimit", HOST_LIMIT, type=int))
+            self.engineCombo.setCurrentIndex(ENGINES.index(settings.value("engine", ENGINE)))
+            self.concurrencySpin.setValue(settings.value("concurrency", CONCURRENCY, type=int))
+            self.adaptiveCheck.setChecked(settings.value("adaptive", ADAPTIVE, type=bool))
+            self.probeCombo.setCurrentIndex(PROBES.index(settings.value("probe", PROBE)))
+            self.fallbackEdit.setText(settings.value("fallbackCodes", ""))
+            self.preResolveCheck.setChecked(settings.value("preResolve", PRE_RESOLVE, type=bool))
+            self.cacheAgeSpin.setValue(settings.value("cacheMaxAge", CACHE_MAX_AGE, type=int))
+            self.conditionalCheck.setChecked(settings.value("conditional", CONDITIONAL, type=bool))
+            self.contentCheck.setChecked(settings.value("contentCheck", CONTENT_CHECK, type=bool))
+            self.keywordsEdit.setText(settings.value("keywords", ""))
+            self.journalCheck.setChecked(settings.value("journal", JOURNAL, type=bool))
+            self.metricsPortSpin.setValue(settings.value("metricsPort", METRICS_PORT, type=int))
+            self.metricsCheck.setChecked(settings.value("metrics", METRICS, type=bool))
+            self._lastJournal = settings.value("lastJournal", None)
+            self.actionNormalize_urls.setChecked(settings.value("normalizeUrls", False, type=bool))
 
     def saveSettings(self):
         settings = QSettings(self._settingsFile, QSettings.IniFormat)
@@ -100,14 +180,48 @@ class MainWindow(QtWidgets.QMainWindow, ui):
         settings.setValue("windowState", self.saveState())
         settings.setValue("tableViewWidth", self.sitesTableView.frameGeometry().width())
         settings.setValue("threadsCount", self.threadsSpin.value())
+        settings.setValue("connectTimeout", self.connectTimeoutSpin.value())
         settings.setValue("timeout", self.timeoutSpin.value())
+        settings.setValue("deadline", self.deadlineSpin.value())
+        settings.setValue("hostLimit", self.hostLimitSpin.value())
+        settings.setValue("engine", ENGINES[self.engineCombo.currentIndex()])
+        settings.setValue("concurrency", self.concurrencySpin.value())
+        settings.setValue("adaptive", self.adaptiveCheck.isChecked())
+        settings.setValue("probe", PROBES[self.probeCombo.currentIndex()])
+        settings.setValue("fallbackCodes", self.fallbackEdit.text())
+        settings.setValue("preResolve", self.preResolveCheck.isChecked())
+        settings.setValue("cacheMaxAge", self.cacheAgeSpin.value())
+        settings.setValue("conditional", self.conditionalCheck.isChecked())
+        settings.setValue("contentCheck", self.contentCheck.isChecked())
+        settings.setValue("keywords", self.keywordsEdit.text())
+        settings.setValue("journal", self.journalCheck.isChecked())
+        settings.setValue("metrics", self.metricsCheck.isChecked())
+        settings.setValue("metricsPort", self.metricsPortSpin.value())
+        if self._lastJournal:
+            settings.setValue("lastJournal", self._lastJournal)
+        else:
+            settings.remove("lastJournal")
+        settings.setValue("normalizeUrls", self.actionNormalize_urls.isChecked())
 
     def onResize(self, event):
         self.resizeTableColumns()
         QtWidgets.QMainWindow.resizeEvent(self, event)
 
     def onClose(self, event):
+        if self._importWorker is not None:
+            self._importWorker._running = False
+        if self._dedupWorker is not None:
+            self._dedupWorker._running = False
+        if self._exportWorker is not None:
+            self._exportWorker._running = False
         self.saveSettings()
+        self.flushResults()
+        self.closeJournal()
+        self._cache.close()
+        if self._contentPool is not None:
+            self._contentPool.shutdown()
+        if self._metricsServer is not None:
+            self._metricsServer.stop()
         QtWidgets.QMainWindow.closeEvent(self, event)
 
     def onShow(self, event):
@@ -118,125 +232,355 @@ class MainWindow(QtWidgets.QMainWindow, ui):
         self.sitesTableView.setColumnWidth(0, int(self.sitesTableView.frameGeometry().width() * 0.6))
         self.sitesTableView.setColumnWidth(1, int(self.sitesTableView.frameGeometry().width() * 0.1))
 
-    def start(self):
+    def onEngineChanged(self, index):
+        isAsync = ENGINES[index] == "asyncio"
+        self.threadsSpin.setEnabled(not isAsync)
+        self.concurrencySpin.setEnabled(isAsync)
+
+    def onMetricsToggled(self, checked):
+        if self._metricsServer is not None:
+            self._metricsServer.stop()
+            self._metricsServer = None
+        if checked:
+            try:
+                self._metricsServer = MetricsServer(self.collectMetrics, self.metricsPortSpin.value()).start()
+            except OSError as e:
+                QtWidgets.QMessageBox.warning(self, "Metrics endpoint",
+                    "Can not listen on port {}: {}".format(self.metricsPortSpin.value(), e))
+                self.metricsCheck.setChecked(False)
+        self.metricsPortSpin.setEnabled(not self.metricsCheck.isChecked())
+
+    def collectMetrics(self):
+        # called from the metrics server thread on every scrape
+        scheduler = self._scheduler
+        return self._stats, len(scheduler) if scheduler is not None else 0
+
+    def resume(self):
+        self.start(resume=True)
+
+    def start(self, resume=False):
+        self._pendingStates = {}
+        self._pendingResults = []
+        self._stopping = False
         self.resetTable()
-        model = self.sitesModel
-        queues = split_list(range(self.sitesModel.rowCount()), self.threadsSpin.value())
         self._progressTotal = self.sitesModel.rowCount()
         self._progressDone = 0
         self._threads = []
         self._workers = []
-        for i, rows in enumerate(queues):
-            self._threads.append(MyThread())
-            queue = Queue()
-            for row in rows:
-                url = model.data(model.index(row, 0))
-                queue.put((row, url))
-            self._workers.append(CheckAliveWorker(check_alive, timeout=self.timeoutSpin.value(), queue=queue))
-            self._workers[i].moveToThread(self._threads[i])
-            self._threads[i].started.connect(self._workers[i].start)
-            self._threads[i].finished.connect(self._threads[i].deleteLater)
-            self._workers[i].status.connect(self.onStatus)
-            self._workers[i].result.connect(self.onResult)
-            self._workers[i].finished.connect(self._threads[i].quit)
-            self._workers[i].finished.connect(self._workers[i].deleteLater)
-        for i in range(self.threadsSpin.value()):
-            self._threads[i].start()
+        self.closeJournal()
+        self._resumeJournal = self._lastJournal if resume and self.canResume() else None
+        self._stats = RunStats()
+        self._rate = RateMeter()
+        # rows must not move while results are written back by index
+        self.setEditActionsEnabled(False)
         self.startButton.setEnabled(False)
+        self.resumeButton.setEnabled(False)
         self.stopButton.setEnabled(True)
+        if self._resumeJournal or self.cacheAgeSpin.value() or self.conditionalCheck.isChecked():
+            self.startLookup()
+        else:
+            self.onLookup(({}, {}, None))
+
+    def startLookup(self):
+        thread = MyThread()
+        worker = LookupWorker(lookupRun, self._cache, self._resumeJournal, list(self.sitesModel.urls()),
+            self.cacheAgeSpin.value() * 60, self.conditionalCheck.isChecked())
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        thread.finished.connect(thread.deleteLater)
+        worker.result.connect(self.onLookup)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        self._threads.append(thread)
+        self._workers.append(worker)
+        self.statusbar.showMessage("Loading journal ..." if self._resumeJournal else "Looking up cached results ...")
+        thread.start()
+
+    @pyqtSlot(object)
+    def onLookup(self, tuple_):
+        done, cached, self._validators = tuple_
+        self.statusbar.clearMessage()
+        if self._stopping:
+            return
+        if done:
+            # keep appending to the same journal so it stays a complete checkpoint
+            self._journal = Journal(self._resumeJournal)
+        elif self.journalCheck.isChecked():
+            self._journal = Journal(journal_path(os.path.join(ROOT, "data", "journal")))
+            self._lastJournal = self._journal.path
+        else:
+            # an older journal does not belong to this run, resuming from it
+            # would skip urls with stale results
+            self._lastJournal = None
+        self._scheduler = HostScheduler(self.hostLimitSpin.value())
+        states = {}
+        resumed = []
+        results = []
+        for row, url in enumerate(self.sitesModel.urls()):
+            if url in done:
+                states[row] = "Done"
+                resumed.append(rowUpdate(dict(done[url], row=row)))
+            elif url in cached:
+                result, statusCode, msg = cached[url]
+                states[row] = "Cached"
+                results.append({"row": row, "url": url, "result": result, "status_code": statusCode, "msg": msg})
+            else:
+                self._scheduler.put(row, url)
+        self.sitesModel.updateRows(states, resumed + [rowUpdate(r) for r in results])
+        if self._journal is not None and results:
+            self._journal.write_many(results)
+        self._stats.total = len(self._scheduler)
+        self._progressDone = len(resumed) + len(results)
+        if done:
+            self.statusbar.showMessage("Resuming, {} of {} urls already checked".format(
+                len(resumed), self._progressTotal))
+        if self.preResolveCheck.isChecked():
+            self.startResolving(self._scheduler.hosts())
+        else:
+            self.startChecking()
+
+    def canResume(self):
+        # the journal does not store the url list, it has to be imported again
+        return bool(self._lastJournal) and os.path.isfile(self._lastJournal) and self.sitesModel.rowCount() > 0
+
+    def updateResumeButton(self, *args):
+        self.resumeButton.setEnabled(self.startButton.isEnabled() and self.canResume())
+
+    def startResolving(self, hosts):
+        thread = MyThread()
+        worker = ResolveWorker(self._resolver.resolve_all, hosts=hosts)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        thread.finished.connect(thread.deleteLater)
+        worker.progress.connect(self.onResolveProgress)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        worker.finished.connect(self.onResolved)
+        self._threads.append(thread)
+        self._workers.append(worker)
+        self.statusbar.showMessage("Resolving {} hosts ...".format(len(hosts)))
+        thread.start()
+
+    @pyqtSlot(tuple)
+    def onResolveProgress(self, tuple_):
+        done, total = tuple_
+        self.progressBar.setValue(int(float(done) / total * 100))
+
+    @pyqtSlot()
+    def onResolved(self):
+        self.statusbar.clearMessage()
+        self.progressBar.setValue(0)
+        if not self._stopping:
+            self.startChecking()
+
+    def startChecking(self):
+        first = len(self._threads)
+        resolver = self._resolver if self.preResolveCheck.isChecked() else None
+        probe = PROBES[self.probeCombo.currentIndex()]
+        fallback = parse_codes(self.fallbackEdit.text())
+        content = self.contentCheck.isChecked()
+        deadline = self.deadlineSpin.value()
+        timeout = (self.connectTimeoutSpin.value(), self.timeoutSpin.value())
+        options = {
+            "scheduler": self._scheduler,
+            "resolver": resolver,
+            "validators": self._validators,
+            "keywords": parse_keywords(self.keywordsEdit.text()),
+            "stats": self._stats,
+        }
+        if content:
+            if self._contentPool is None:
+                self._contentPool = ContentPool()
+            options["contentPool"] = self._contentPool
+        isAsync = ENGINES[self.engineCombo.currentIndex()] == "asyncio"
+        self._limiter = None
+        if self.adaptiveCheck.isChecked():
+            self._limiter = AdaptiveLimiter(self.concurrencySpin.value() if isAsync else self.threadsSpin.value())
+            options["limiter"] = self._limiter
+        if isAsync:
+            check = partial(check_alive_async, probe=probe, fallback=fallback, content=content, deadline=deadline)
+            self.addWorker(AsyncCheckAliveWorker(check, timeout=timeout,
+                concurrency=self.concurrencySpin.value(), **options))
+        else:
+            check = partial(check_alive, probe=probe, fallback=fallback, content=content, deadline=deadline)
+            for i in range(self.threadsSpin.value()):
+                self.addWorker(CheckAliveWorker(check, timeout=timeout, **options))
+        for thread in self._threads[first:]:
+            thread.start()
+
+    def addWorker(self, worker):
+        thread = MyThread()
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        thread.finished.connect(thread.deleteLater)
+        worker.status.connect(self.onStatus)
+        worker.result.connect(self.onResult)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        self._threads.append(thread)
+        self._workers.append(worker)
 
     def setActiveThreadsCount(self, i):
         self._activeThreads = i
 
     def pulse(self):
-        self.labelActiveThreads.setText("Active threads: {}".format(MyThread.activeCount))
-        if MyThread.activeCount == 0:
+        label = "Active threads: {}".format(MyThread.activeCount)
+        if self._limiter is not None and MyThread.activeCount:
+            label += ", concurrency: {}/{}".format(self._limiter.limit, self._limiter.maximum)
+        speed, eta = self.updateMetrics(MyThread.activeCount > 0)
+        if MyThread.activeCount:
+            label += ", {:.1f} urls/s, ETA {}".format(speed, eta)
+        self.labelActiveThreads.setText(label)
+        if MyThread.activeCount == 0 and self._importThread is None and self._dedupThread is None:
+            if self._journal is not None:
+                self.flushResults()
+                self.closeJournal()
             if not self.sitesTableView.isSortingEnabled():
                 self.sitesTableView.setSortingEnabled(True)
             if not self.startButton.isEnabled():
                 self.startButton.setEnabled(True)
+                self.setEditActionsEnabled(True)
+                self.resumeButton.setEnabled(self.canResume())
             if self.stopButton.isEnabled():
                 self.stopButton.setEnabled(False)
         else:
             if self.sitesTableView.isSortingEnabled():
                 self.sitesTableView.setSortingEnabled(False)
 
+    def updateMetrics(self, running):
+        # counters come from the workers, the model is not scanned
+        stats = self._stats.snapshot()
+        speed, average = self._rate.update(stats["finished"]) if running else (0.0, 0.0)
+        remaining = stats["total"] - stats["finished"]
+        eta = format_duration(remaining / average) if average and remaining > 0 else "-"
+        self.checkedValue.setText("{} of {}".format(stats["finished"], stats["total"]))
+        self.speedValue.setText("{:.1f} urls/s".format(speed))
+        self.averageValue.setText("{:.1f} urls/s".format(average))
+        self.etaValue.setText(eta)
+        self.okValue.setText(str(stats["ok"]))
+        self.failedValue.setText(str(stats["failed"]))
+        self.timeoutsValue.setText(str(stats["timeouts"]))
+        self.dnsFailuresValue.setText(str(stats["dns_failures"]))
+        self.inFlightValue.setText(str(stats["in_flight"]))
+        self.receivedValue.setText(format_bytes(stats["bytes"]))
+        return speed, eta
+
+    def closeJournal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
     def stop(self):
-        for i, _ in enumerate(self._workers):
-            self._workers[i]._running = False
+        self._stopping = True
+        for worker in self._workers:
+            worker.stop()
+        if self._scheduler is not None:
+            self._scheduler.clear()
+        if self._limiter is not None:
+            self._limiter.wake()
 
     @pyqtSlot(tuple)
     def onStatus(self, tuple_):
         i, status = tuple_
-        self.sitesModel.setData(self.sitesModel.index(i, 3), status)
+        self._pendingStates[i] = status
 
     @pyqtSlot(object)
     def onResult(self, result):
-        self.sitesModel.item(result["row"], 1).setFont(self._boldFont)
-        # self.sitesModel.item(result["row"], 1).setForeground(Qt.white)
-        self.sitesModel.setData(self.sitesModel.index(result["row"], 2), result["status_code"])
-        if result["result"]:
-            self.sitesModel.setData(self.sitesModel.index(result["row"], 1), "OK")
-            self.sitesModel.item(result["row"], 1).setForeground(Qt.green)
-            logger.info("{} {}".format(result["url"], result["status_code"]))
-        else:
-            self.sitesModel.setData(self.sitesModel.index(result["row"], 1), "Fail")
-            self.sitesModel.item(result["row"], 1).setForeground(Qt.red)
-            logger.info("{} {}".format(result["url"], result["msg"]))
-        self._progressDone += 1
-        self.progressBar.setValue(int(float(self._progressDone) / self._progressTotal * 100))
+        self._pendingResults.append(result)
+
+    def flushResults(self):
+        if not self._pendingStates and not self._pendingResults:
+            return
+        states, self._pendingStates = self._pendingStates, {}
+        results, self._pendingResults = self._pendingResults, []
+        self.sitesModel.updateRows(states, [rowUpdate(r) for r in results])
+        if results:
+            self._cache.put_many(results)
+            if self._journal is not None:
+                self._journal.write_many(results)
+        for result in results:
+            if result["result"]:
+                logger.info("{} {}".format(result["url"], result["status_code"]))
+            else:
+                logger.info("{} {}".format(result["url"], result["msg"]))
+        self._progressDone += len(results)
+        if self._progressTotal:
+            self.progressBar.setValue(int(float(self._progressDone) / self._progressTotal * 100))
 
     def importUrls(self):
         filePath, fileType = QtWidgets.QFileDialog.getOpenFileName(self, "Import URLs", filter="Text files (*.txt)")
-        if filePath:
-            text = readTextFile(filePath)
-            for url in text.strip().splitlines():
-                resultCell = QStandardItem("")
-                resultCell.setTextAlignment(Qt.AlignCenter)
-                codeCell = QStandardItem("")
-                codeCell.setTextAlignment(Qt.AlignCenter)
-                self.sitesModel.appendRow([QStandardItem(url), resultCell, codeCell])
+        if filePath and self._importThread is None:
+            self._importThread = QThread()
+            self._importWorker = ImportUrlsWorker(None, filePath=filePath, chunkSize=IMPORT_CHUNK)
+            self._importWorker.moveToThread(self._importThread)
+            self._importThread.started.connect(self._importWorker.start)
+            self._importThread.finished.connect(self._importThread.deleteLater)
+            self._importThread.finished.connect(self.onImportFinished)
+            self._importWorker.urls.connect(self.onImportUrls)
+            self._importWorker.progress.connect(self.progressBar.setValue)
+            self._importWorker.finished.connect(self._importThread.quit)
+            self._importWorker.finished.connect(self._importWorker.deleteLater)
+            self.importUrlsAction.setEnabled(False)
+            self.startButton.setEnabled(False)
+            self.resumeButton.setEnabled(False)
+            self.sitesTableView.setSortingEnabled(False)
+            self.progressBar.setValue(0)
+            self._importThread.start()
+
+    @pyqtSlot(list)
+    def onImportUrls(self, urls):
+        self.sitesModel.appendUrls(urls)
+        self.statusbar.showMessage("Imported {} URLs".format(self.sitesModel.rowCount()))
+
+    @pyqtSlot()
+    def onImportFinished(self):
+        self._importThread = None
+        self._importWorker = None
+        self.importUrlsAction.setEnabled(True)
 
     def sitesTableView_doubleClicked(self, modelIndex):
-        model = self.sitesModel
-        row = modelIndex.row()
-        url = model.data(model.index(row, 0))
-        webbrowser.open(url)
+        webbrowser.open(self.sitesModel.url(modelIndex.row()))
 
     def resetTable(self):
-        model = self.sitesModel
-        for i in range(model.rowCount()):
-            model.setData(model.index(i, 1), "")
-            model.setData(model.index(i, 2), "")
+        self.sitesModel.resetResults()
 
     def clearTable(self):
-        self.tableRemoveAllRows(self.sitesModel)
-
-    def tableRemoveAllRows(self, model):
-        for i in reversed(range(model.rowCount())):
-            model.removeRow(i)
+        self.sitesModel.clear()
 
     def exportResults(self):
-        filePath, fileType = QtWidgets.QFileDialog.getSaveFileName(self, "Export URLs", filter="Text file (*.txt);;CSV file (*.csv);;JSON file (*.json)")
-        model = self.sitesModel
-        data = []
-        for i in range(model.rowCount()):
-            data.append({
-                "URL": model.data(model.index(i, 0)),
-                "Result": model.data(model.index(i, 1)),
-                "Code": model.data(model.index(i, 2)),
-            })
-        if "*.txt" in fileType:
-            with open(filePath, "w") as f:
-                f.write("\n".join([i["URL"] for i in data]))
-        elif "*.csv" in fileType:
-            with open(filePath, "w") as f:
-                w = csv.DictWriter(f, data[0].keys())
-                w.writeheader()
-                w.writerows(data)
-        elif "*.json" in fileType:
-            with open(filePath, "w") as f:
-                f.write(json.dumps(data))
+        if self._exportThread is not None:
+            return
+        filePath, fileType = QtWidgets.QFileDialog.getSaveFileName(self, "Export URLs",
+            filter=";;".join(EXPORT_FORMATS))
+        if not filePath:
+            return
+        format = EXPORT_FORMATS[fileType]
+        if fileType.endswith(".gz)") and not filePath.endswith(".gz"):
+            filePath += ".gz"
+        self._exportThread = QThread()
+        self._exportWorker = ExportWorker(export_rows, rows=self.sitesModel.resultRows(), filePath=filePath,
+            format=format, fields=["URL"] if format == "text" else EXPORT_FIELDS,
+            total=self.sitesModel.rowCount())
+        self._exportWorker.moveToThread(self._exportThread)
+        self._exportThread.started.connect(self._exportWorker.start)
+        self._exportThread.finished.connect(self._exportThread.deleteLater)
+        self._exportThread.finished.connect(self.onExportFinished)
+        self._exportWorker.progress.connect(self.onExportProgress)
+        self._exportWorker.finished.connect(self._exportThread.quit)
+        self._exportWorker.finished.connect(self._exportWorker.deleteLater)
+        self.exportResultsAction.setEnabled(False)
+        self._exportThread.start()
+
+    @pyqtSlot(tuple)
+    def onExportProgress(self, tuple_):
+        done, total = tuple_
+        self.statusbar.showMessage("Exported {} of {} rows".format(done, total))
+
+    @pyqtSlot()
+    def onExportFinished(self):
+        self._exportThread = None
+        self._exportWorker = None
+        self.exportResultsAction.setEnabled(True)
 
     def about(self):
         QtWidgets.QMessageBox.about(self, "About {}".format(__title__),
@@ -252,40 +596,72 @@ class MainWindow(QtWidgets.QMainWindow, ui):
     def test(self):
         pass
 
-    def selectedRows(self):
-        rows = set()
-        for index in self.sitesTableView.selectionModel().selectedIndexes():
-            rows.add(index.row())
+    def showTimings(self):
+        QtWidgets.QMessageBox.information(self, "Timing histograms",
+            "<pre>{}</pre>".format(html.escape(self._stats.report())))
 
-        return list(rows)
+    def selectedRanges(self):
+        ranges = sorted((r.top(), r.bottom()) for r in self.sitesTableView.selectionModel().selection())
+        merged = []
+        for top, bottom in ranges:
+            if merged and top <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], bottom)
+            else:
+                merged.append([top, bottom])
+        return merged
 
     def removeSelected(self):
-        model = self.sitesModel
-        for i in reversed(self.selectedRows()):
-            model.removeRow(i)
+        self.sitesModel.removeRanges(self.selectedRanges())
 
     def removeDuplicates(self):
-        items = []
-        foundDuplicates = False
-        for i in range(self.sitesModel.rowCount()):
-            item = self.sitesModel.data(self.sitesModel.index(i, 0))
-            if item not in items:
-                items.append(item)
-            else:
-                foundDuplicates = True
-        if foundDuplicates:
-            self.clearTable()
-            for i, item in enumerate(items):
-                self.sitesModel.setData(self.sitesModel.index(i, 0), item)
+        if self._dedupThread is not None or self._importThread is not None or MyThread.activeCount:
+            return
+        key = partial(normalize_url, strip_slash=True) if self.actionNormalize_urls.isChecked() else None
+        self._dedupThread = QThread()
+        self._dedupWorker = DedupWorker(unique_rows, urls=list(self.sitesModel.urls()), key=key)
+        self._dedupWorker.moveToThread(self._dedupThread)
+        self._dedupThread.started.connect(self._dedupWorker.start)
+        self._dedupThread.finished.connect(self._dedupThread.deleteLater)
+        self._dedupThread.finished.connect(self.onDedupFinished)
+        self._dedupWorker.rows.connect(self.onDuplicatesFound)
+        self._dedupWorker.finished.connect(self._dedupThread.quit)
+        self._dedupWorker.finished.connect(self._dedupWorker.deleteLater)
+        self.setEditActionsEnabled(False)
+        self.startButton.setEnabled(False)
+        self.resumeButton.setEnabled(False)
+        self.sitesTableView.setSortingEnabled(False)
+        self.statusbar.showMessage("Removing duplicates ...")
+        self._dedupThread.start()
+
+    @pyqtSlot(object)
+    def onDuplicatesFound(self, rows):
+        removed = self.sitesModel.rowCount() - len(rows)
+        if removed:
+            self.sitesModel.keepRows(rows)
+        self.statusbar.showMessage("Removed {} duplicates".format(removed))
+
+    @pyqtSlot()
+    def onDedupFinished(self):
+        self._dedupThread = None
+        self._dedupWorker = None
+        self.setEditActionsEnabled(True)
+
+    def setEditActionsEnabled(self, enabled):
+        for action in (self.importUrlsAction, self.clearTableAction, self.actionRemove_duplicates,
+                self.actionRemove_selected):
+            action.setEnabled(enabled)
 
     def invertSelection(self):
-        # self.sitesTableView.selectAll()
-        selectedRows = self.selectedRows()
-        self.sitesTableView.clearSelection()
-        for i in range(self.sitesModel.rowCount()):
-            if i not in selectedRows:
-                self.sitesTableView.selectRow(i)
-        # for index in self.sitesTableView.selectionModel():
-        #     index.select()
-        #     break
-        # self.sitesTableView.selectionModel().select(self.sitesModel.index(0, 1), QItemSelectionModel.Deselect)
\ No newline at end of file
+        model = self.sitesModel
+        lastColumn = model.columnCount() - 1
+        selection = QItemSelection()
+        top = 0
+        for first, last in self.selectedRanges():
+            if first > top:
+                selection.select(model.index(top, 0), model.index(first - 1, lastColumn))
+            top = last + 1
+        if top < model.rowCount():
+            selection.select(model.index(top, 0), model.index(model.rowCount() - 1, lastColumn))
+        # ClearAndSelect diffs the old and new ranges pairwise, clearing first keeps it linear
+        self.sitesTableView.selectionModel().clearSelection()
+        self.sitesTableView.selectionModel().select(selection, QItemSelectionModel.Select)
@@ -0,0 +1,161 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import threading
+from bisect import bisect_left
+from collections import deque
+from time import monotonic
+
+from .defaults import RATE_WINDOW
+from .timing import PHASES, TIMING_FIELDS, TIMING_HEADERS
+
+# upper bounds in milliseconds, one more bucket holds everything slower
+BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+class Histogram(object):
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        # interpolated inside the bucket holding the p-th value
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+class RunTimings(object):
+    # one histogram per phase over the results of a run
+    def __init__(self):
+        self.histograms = [Histogram() for _ in PHASES]
+
+    def add(self, result):
+        for histogram, field in zip(self.histograms, TIMING_FIELDS):
+            ms = result.get(field)
+            if ms is not None:
+                histogram.add(ms)
+
+    def add_many(self, results):
+        for result in results:
+            self.add(result)
+
+    def report(self):
+        # text table, bucket counts per phase followed by summary rows
+        headers = [header.split()[0] for header in TIMING_HEADERS]
+        lines = ["{:>10}".format("<= ms") + "".join("{:>9}".format(header) for header in headers)]
+        used = [i for i in range(len(BUCKETS) + 1) if any(h.counts[i] for h in self.histograms)]
+        for i in range(used[0], used[-1] + 1) if used else ():
+            bound = str(BUCKETS[i]) if i < len(BUCKETS) else "more"
+            lines.append("{:>10}".format(bound) + "".join("{:>9}".format(h.counts[i]) for h in self.histograms))
+        for name, value in (("count", lambda h: h.count), ("mean", lambda h: h.sum / h.count if h.count else None),
+                ("p50", lambda h: h.percentile(50)), ("p90", lambda h: h.percentile(90)),
+                ("p99", lambda h: h.percentile(99)), ("max", lambda h: h.max if h.count else None)):
+            lines.append("{:>10}".format(name) + "".join(
+                "{:>9}".format("-" if value(h) is None else "{:g}".format(round(value(h), 1)))
+                for h in self.histograms))
+        return "\n".join(lines)
+
+
+class RunStats(object):
+    # Counters of a run, updated by the engines as urls are taken off the
+    # queue and their results come in, read from any thread with snapshot()
+    def __init__(self, total=0):
+        self._lock = threading.Lock()
+        self.total = total
+        self.timings = RunTimings()
+        self._counts = dict.fromkeys(["finished", "ok", "failed", "timeouts", "dns_failures", "in_flight",
+            "bytes"], 0)
+        self._classes = {}
+
+    def checking(self):
+        with self._lock:
+            self._counts["in_flight"] += 1
+
+    def aborted(self):
+        with self._lock:
+            self._counts["in_flight"] -= 1
+
+    def add(self, result):
+        counts = self._counts
+        with self._lock:
+            counts["in_flight"] -= 1
+            counts["finished"] += 1
+            counts["ok" if result["result"] else "failed"] += 1
+            error = result.get("error")
+            if error == "timeout":
+                counts["timeouts"] += 1
+            elif error == "dns":
+                counts["dns_failures"] += 1
+            counts["bytes"] += result.get("bytes") or 0
+            status = status_class(result["status_code"])
+            self._classes[status] = self._classes.get(status, 0) + 1
+            self.timings.add(result)
+
+    def counted(self, on_result):
+        def callback(result):
+            self.add(result)
+            on_result(result)
+        return callback
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts, total=self.total, classes=dict(self._classes))
+
+    def report(self):
+        with self._lock:
+            return self.timings.report()
+
+    def histograms(self):
+        # (phase, bucket counts, sum, count) copies, safe while the run goes on
+        with self._lock:
+            return [(phase, list(h.counts), h.sum, h.count) for phase, h in zip(PHASES, self.timings.histograms)]
+
+def status_class(status_code):
+    # "2xx" style label, "none" when no response was received
+    return "{}xx".format(status_code // 100) if status_code else "none"
+
+class RateMeter(object):
+    # rate since the previous update and the average over the last `window`
+    # seconds, fed with a growing count
+    def __init__(self, window=RATE_WINDOW):
+        self._window = window
+        self._samples = deque()
+
+    def update(self, count, now=None):
+        now = monotonic() if now is None else now
+        instant = 0.0
+        if self._samples and now > self._samples[-1][0]:
+            instant = (count - self._samples[-1][1]) / (now - self._samples[-1][0])
+        self._samples.append((now, count))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self._window:
+            self._samples.popleft()
+        first, first_count = self._samples[0]
+        average = (count - first_count) / (now - first) if now > first else 0.0
+        return instant, average
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02}:{:02}".format(hours, minutes, seconds)
+
+def format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return "{:.0f} {}".format(count, unit) if unit == "B" else "{:.1f} {}".format(count, unit)
+        count /= 1024.0
@@ -0,0 +1,210 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+from array import array
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor, QFont
+
+from .timing import TIMING_FIELDS, TIMING_HEADERS
+
+NO_RESULT = -1
+NO_CODE = 0
+NO_TIME = -1.0
+TIMINGS_COLUMN = 5
+
+class SitesModel(QAbstractTableModel):
+    HEADERS = ["URL", "Result", "Code", "Status", "Title"] + TIMING_HEADERS
+    STATES = ["", "Checking ...", "Done", "Cached", "Parsing ..."]
+
+    def __init__(self, parent=None):
+        super(SitesModel, self).__init__(parent)
+        self._urls = []
+        self._results = array("b")
+        self._codes = array("H")
+        self._states = array("B")
+        self._titles = []
+        self._timings = [array("f") for _ in TIMING_FIELDS]
+        self._boldFont = QFont()
+        self._boldFont.setBold(True)
+        self._colors = {0: QColor(Qt.red), 1: QColor(Qt.green)}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._urls)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            if orientation == Qt.Horizontal:
+                return self.HEADERS[section]
+            return section + 1
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self._urls[row]
+            elif column == 1:
+                result = self._results[row]
+                return "" if result == NO_RESULT else ("OK" if result else "Fail")
+            elif column == 2:
+                code = self._codes[row]
+                return "" if code == NO_CODE else code
+            elif column == 3:
+                return self.STATES[self._states[row]]
+            elif column == 4:
+                return self._titles[row]
+            else:
+                ms = self._timings[column - TIMINGS_COLUMN][row]
+                return "" if ms == NO_TIME else "{:.1f}".format(ms)
+        elif role == Qt.TextAlignmentRole:
+            if column in (1, 2):
+                return Qt.AlignCenter
+            if column >= TIMINGS_COLUMN:
+                return Qt.AlignRight | Qt.AlignVCenter
+        elif role == Qt.FontRole:
+            if column == 1 and self._results[row] != NO_RESULT:
+                return self._boldFont
+        elif role == Qt.ForegroundRole:
+            if column == 1:
+                return self._colors.get(self._results[row])
+        return None
+
+    def url(self, row):
+        return self._urls[row]
+
+    def urls(self):
+        return self._urls
+
+    def resultRows(self):
+        # shallow copies taken here, so a thread exporting the rows is not disturbed by later edits
+        columns = zip(list(self._urls), array("b", self._results), array("H", self._codes), list(self._titles),
+            *[array("f", timings) for timings in self._timings])
+
+        def resultRow(url, result, code, title, *timings):
+            row = {
+                "URL": url,
+                "Result": None if result == NO_RESULT else ("OK" if result else "Fail"),
+                "Code": None if code == NO_CODE else code,
+                "Title": title,
+            }
+            for header, ms in zip(TIMING_HEADERS, timings):
+                row[header] = None if ms == NO_TIME else round(ms, 1)
+            return row
+
+        return (resultRow(*values) for values in columns)
+
+    def appendUrls(self, urls):
+        if not urls:
+            return
+        first = len(self._urls)
+        self.beginInsertRows(QModelIndex(), first, first + len(urls) - 1)
+        self._urls.extend(urls)
+        self._results.extend(array("b", [NO_RESULT]) * len(urls))
+        self._codes.extend(array("H", [NO_CODE]) * len(urls))
+        self._states.extend(array("B", [0]) * len(urls))
+        self._titles.extend([None] * len(urls))
+        for timings in self._timings:
+            timings.extend(array("f", [NO_TIME]) * len(urls))
+        self.endInsertRows()
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if count <= 0 or row < 0 or row + count > len(self._urls):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for column in [self._urls, self._results, self._codes, self._states, self._titles] + self._timings:
+            del column[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def removeRanges(self, ranges):
+        # (first, last) row pairs, sorted and not overlapping
+        if len(ranges) > 64:
+            # one pass over the columns beats shifting them once per block
+            keep = bytearray(b"\x01") * len(self._urls)
+            for first, last in ranges:
+                keep[first:last + 1] = bytes(last - first + 1)
+            self.keepRows([row for row, kept in enumerate(keep) if kept])
+        else:
+            for first, last in reversed(ranges):
+                self.removeRows(first, last - first + 1)
+
+    def keepRows(self, rows):
+        self.beginResetModel()
+        self._reorder(rows)
+        self.endResetModel()
+
+    def _reorder(self, rows):
+        self._urls = [self._urls[i] for i in rows]
+        self._results = array("b", (self._results[i] for i in rows))
+        self._codes = array("H", (self._codes[i] for i in rows))
+        self._states = array("B", (self._states[i] for i in rows))
+        self._titles = [self._titles[i] for i in rows]
+        self._timings = [array("f", (timings[i] for i in rows)) for timings in self._timings]
+
+    def clear(self):
+        self.beginResetModel()
+        self._urls = []
+        self._results = array("b")
+        self._codes = array("H")
+        self._states = array("B")
+        self._titles = []
+        self._timings = [array("f") for _ in TIMING_FIELDS]
+        self.endResetModel()
+
+    def resetResults(self):
+        self.beginResetModel()
+        count = len(self._urls)
+        self._results = array("b", [NO_RESULT]) * count
+        self._codes = array("H", [NO_CODE]) * count
+        self._states = array("B", [0]) * count
+        self._titles = [None] * count
+        self._timings = [array("f", [NO_TIME]) * count for _ in TIMING_FIELDS]
+        self.endResetModel()
+
+    def updateRows(self, states, results):
+        # rows of a table cleared mid-run are dropped
+        count = len(self._urls)
+        rows = [row for row in states if row < count]
+        for row in rows:
+            self._states[row] = self.STATES.index(states[row])
+        for row, result, statusCode, title, timings in results:
+            if row >= count:
+                continue
+            self._results[row] = 1 if result else 0
+            self._codes[row] = statusCode or NO_CODE
+            self._titles[row] = title
+            for column, ms in zip(self._timings, timings):
+                column[row] = NO_TIME if ms is None else ms
+            rows.append(row)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), len(self.HEADERS) - 1))
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column == 0:
+            key = self._urls.__getitem__
+        elif column == 1:
+            key = self._results.__getitem__
+        elif column == 2:
+            key = self._codes.__getitem__
+        elif column == 3:
+            key = self._states.__getitem__
+        elif column == 4:
+            key = lambda row: self._titles[row] or ""
+        else:
+            key = self._timings[column - TIMINGS_COLUMN].__getitem__
+        self.layoutAboutToBeChanged.emit()
+        rows = sorted(range(len(self._urls)), key=key, reverse=order == Qt.DescendingOrder)
+        positions = array("L", [0]) * len(rows)
+        for position, row in enumerate(rows):
+            positions[row] = position
+        self._reorder(rows)
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(persistent,
+            [self.index(positions[i.row()], i.column()) for i in persistent])
+        self.layoutChanged.emit()
\ No newline at end of file
@@ -0,0 +1,101 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# Prometheus scrape endpoint for a run, in the Prometheus text format or in
+# OpenMetrics when the scraper asks for it:
+#
+#   curl http://127.0.0.1:9464/metrics
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+
+from .defaults import METRICS_HOST, METRICS_PORT
+from .metrics import BUCKETS
+
+PREFIX = "sitechecker_"
+TEXT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        .replace("\n", "\\n")) for name, value in labels) + "}"
+
+def family(lines, name, kind, help_text, samples, openmetrics):
+    # samples are (suffix, labels, value); OpenMetrics names a counter family
+    # without its _total suffix
+    base = name[:-len("_total")] if openmetrics and kind == "counter" else name
+    lines.append("# HELP {}{} {}".format(PREFIX, base, help_text))
+    lines.append("# TYPE {}{} {}".format(PREFIX, base, kind))
+    for suffix, labels, value in samples:
+        lines.append("{}{}{}{} {}".format(PREFIX, name, suffix, format_labels(labels), value))
+
+def render(stats, queued, openmetrics=False):
+    counts = stats.snapshot()
+    lines = []
+    family(lines, "urls", "gauge", "Urls in the run.", [("", (), counts["total"])], openmetrics)
+    family(lines, "queue_depth", "gauge", "Urls waiting to be checked.", [("", (), queued)], openmetrics)
+    family(lines, "in_flight", "gauge", "Checks in progress.", [("", (), counts["in_flight"])], openmetrics)
+    family(lines, "requests_total", "counter", "Finished checks by HTTP status class, none without a response.",
+        [("", (("class", status),), count) for status, count in sorted(counts["classes"].items())], openmetrics)
+    family(lines, "results_total", "counter", "Finished checks by result.",
+        [("", (("result", "ok"),), counts["ok"]), ("", (("result", "failed"),), counts["failed"])], openmetrics)
+    family(lines, "timeouts_total", "counter", "Checks that timed out or ran past their deadline.",
+        [("", (), counts["timeouts"])], openmetrics)
+    family(lines, "dns_failures_total", "counter", "Checks whose host name did not resolve.",
+        [("", (), counts["dns_failures"])], openmetrics)
+    family(lines, "received_bytes_total", "counter", "Header and body bytes received.",
+        [("", (), counts["bytes"])], openmetrics)
+    samples = []
+    for phase, buckets, total, count in stats.histograms():
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + [float("inf")], buckets):
+            cumulative += bucket
+            le = "+Inf" if bound == float("inf") else repr(bound / 1000.0)
+            samples.append(("_bucket", (("phase", phase), ("le", le)), cumulative))
+        samples.append(("_sum", (("phase", phase),), repr(round(total / 1000.0, 6))))
+        samples.append(("_count", (("phase", phase),), count))
+    family(lines, "phase_seconds", "histogram", "Time spent per check in each phase.", samples, openmetrics)
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = render(*self.server.collect(), openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_TYPE if openmetrics else TEXT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class MetricsHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class MetricsServer(object):
+    # Serves /metrics from a daemon thread. collect() is called on every
+    # scrape and returns the RunStats of the current run and the number of
+    # urls still queued. Binding fails with OSError when the port is taken.
+    def __init__(self, collect, port=METRICS_PORT, host=METRICS_HOST):
+        self._server = MetricsHTTPServer((host, port), MetricsHandler)
+        self._server.collect = collect
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self.address = self._server.server_address
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,58 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+from .defaults import DNS_NEGATIVE_TTL, DNS_TTL, DNS_WORKERS
+
+DNS_ERROR = "DNS lookup failed"
+
+class Resolver(object):
+    def __init__(self, ttl=DNS_TTL, negative_ttl=DNS_NEGATIVE_TTL):
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def cached(self, host):
+        with self._lock:
+            entry = self._cache.get(host)
+        if entry is not None and entry[1] > monotonic():
+            return entry[0]
+        return None
+
+    def resolve(self, host):
+        addresses = self.cached(host)
+        if addresses is not None:
+            return addresses
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM, flags=socket.AI_ADDRCONFIG)
+            addresses = []
+            for family, _, _, _, address in infos:
+                if (family, address[0]) not in addresses:
+                    addresses.append((family, address[0]))
+        except (socket.gaierror, UnicodeError):
+            addresses = []
+        ttl = self._ttl if addresses else self._negative_ttl
+        with self._lock:
+            self._cache[host] = (addresses, monotonic() + ttl)
+        return addresses
+
+    def resolve_all(self, hosts, workers=DNS_WORKERS, on_progress=lambda done, total: None,
+            running=lambda: True):
+        hosts = [host for host in hosts if host and self.cached(host) is None]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._resolve_if, host, running) for host in hosts]
+            for i, future in enumerate(futures):
+                future.result()
+                on_progress(i + 1, len(hosts))
+
+    def _resolve_if(self, host, running):
+        if running():
+            self.resolve(host)
+
+    def failed(self, host):
+        return bool(host) and not self.resolve(host)
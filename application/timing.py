@@ -0,0 +1,81 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+PHASES = ["dns", "connect", "tls", "ttfb", "total"]
+TIMING_FIELDS = ["dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "total_ms"]
+TIMING_HEADERS = ["DNS ms", "Connect ms", "TLS ms", "TTFB ms", "Total ms"]
+
+# the timer of the check running in this thread or asyncio task
+_timer = ContextVar("timer", default=None)
+
+class PhaseTimer(object):
+    # Collects phase durations of one check. Phases are summed over every
+    # request the check makes (redirects, fallback GET), a reused connection
+    # adds nothing to dns/connect/tls. Phases the engine can not observe are
+    # left out and reported as None. Also counts the bytes received.
+    def __init__(self, phases=PHASES):
+        self._phases = dict.fromkeys(phases, 0.0)
+        self._started = None
+        self._token = None
+        self._responses = []
+        self.received = 0
+
+    def __enter__(self):
+        self._started = perf_counter()
+        self._token = _timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if "total" in self._phases:
+            self._phases["total"] = perf_counter() - self._started
+        # bodies are read after the response is handed over, count them now
+        self.received += sum(response.tell() for response in self._responses)
+        self._responses = []
+        _timer.reset(self._token)
+
+    def add(self, phase, seconds):
+        if phase in self._phases:
+            self._phases[phase] += seconds
+
+    def add_response(self, response):
+        # a urllib3 response, its headers now and its body when the check ends
+        self.received += header_size(response.headers.items())
+        self._responses.append(response)
+
+    def timings(self):
+        return {
+            field: round(self._phases[phase] * 1000, 1) if phase in self._phases else None
+            for phase, field in zip(PHASES, TIMING_FIELDS)
+        }
+
+def record(phase, seconds):
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+
+def record_bytes(count):
+    timer = _timer.get()
+    if timer is not None:
+        timer.received += count
+
+def record_response(response):
+    timer = _timer.get()
+    if timer is not None:
+        timer.add_response(response)
+
+def header_size(headers):
+    # "Name: value\r\n" per header plus the blank line, the status line is left out
+    return sum(len(name) + len(value) + 4 for name, value in headers) + 2
+
+@contextmanager
+def phase(name):
+    # times the block even when it raises, a timeout still took that long
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, perf_counter() - started)
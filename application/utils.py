@@ -1,26 +1,200 @@
 # -*- coding: UTF-8 -*-
 #!/usr/bin/env python
 
+import socket
 from time import sleep
+from urllib.parse import urlsplit, urlunsplit
 
 import requests
+from urllib3.exceptions import NameResolutionError
 
-from .conf import HEADERS
-from .defaults import TIMEOUT
+from .adapters import CheckAdapter
+from .conf import HEADERS, RANGE, VALIDATORS
+from .deadline import Deadline
+from .defaults import DEADLINE, FALLBACK_CODES, MAX_CONTENT, POOL_CONNECTIONS, POOL_MAXSIZE, PROBE, TIMEOUT
+from .timing import PhaseTimer
 
-def check_alive(url, timeout=TIMEOUT):
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, resolver=None, canceller=None):
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = CheckAdapter(resolver, canceller, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Probes return (status code, headers, body). The body is None unless
+# content is asked for and the probe made a full GET of a live page, which
+# saves downloading the page a second time.
+def probe_head(http, url, timeout, headers, content=False):
+    r = http.head(url, headers=headers, allow_redirects=True, timeout=timeout)
+    return r.status_code, r.headers, None
+
+def probe_get(http, url, timeout, headers, content=False):
+    r = http.get(url, headers=headers, allow_redirects=True, timeout=timeout)
+    return r.status_code, r.headers, r.content[:MAX_CONTENT] if content and has_content(r.status_code) else None
+
+def probe_range(http, url, timeout, headers, content=False):
+    with http.get(url, headers=dict(headers, Range=RANGE), allow_redirects=True, timeout=timeout,
+            stream=True) as r:
+        return ranged_status(r.status_code), r.headers, None
+
+def probe_stream(http, url, timeout, headers, content=False):
+    with http.get(url, headers=headers, allow_redirects=True, timeout=timeout, stream=True) as r:
+        body = None
+        if content and has_content(r.status_code):
+            body = r.raw.read(MAX_CONTENT, decode_content=True)
+        return r.status_code, r.headers, body
+
+# name: (first request, fallback request or None)
+PROBES = {
+    "head_get": (probe_head, probe_get),
+    "head": (probe_head, None),
+    "head_range": (probe_head, probe_range),
+    "stream": (probe_stream, None),
+}
+
+def read_body(http, url, timeout, headers=HEADERS, limit=MAX_CONTENT):
+    with http.get(url, headers=headers, allow_redirects=True, timeout=timeout, stream=True) as r:
+        return r.raw.read(limit, decode_content=True)
+
+def check_alive(url, timeout=TIMEOUT, session=None, probe=PROBE, fallback=FALLBACK_CODES, validators=None,
+        content=False, deadline=DEADLINE):
+    # timeout is seconds or a (connect, read) pair, deadline caps the whole
+    # check including redirects and the fallback request, 0 for none
     status_code = None
     msg = ''
+    info = dict(validators or {})
+    headers = conditional_headers(validators)
+    http = session or requests
+    first, then = PROBES[probe]
+    with PhaseTimer() as timer, Deadline(deadline) as limit:
+        try:
+            status_code, response_headers, body = first(http, url, timeout, headers, content)
+            if then is not None and needs_fallback(status_code, fallback):
+                status_code, response_headers, body = then(http, url, timeout, headers, content)
+            info.update(response_validators(response_headers))
+            if content and has_content(status_code):
+                info["body"] = body if body is not None else read_body(http, url, timeout)
+        except requests.exceptions.Timeout as e:
+            msg = str(e)
+            info["error"] = "timeout"
+        except Exception as e:
+            msg = str(e)
+            if is_name_error(e):
+                info["error"] = "dns"
+    if limit.expired and msg:
+        msg = deadline_message(deadline)
+        info["error"] = "timeout"
+    info.update(timer.timings())
+    info["bytes"] = timer.received
+    return status_code, msg, info
+
+def is_name_error(error):
+    # requests raises ConnectionError from a MaxRetryError whose reason is
+    # the NameResolutionError
+    while error is not None:
+        if isinstance(error, (NameResolutionError, socket.gaierror)):
+            return True
+        error = getattr(error, "reason", None) or error.__context__
+    return False
+
+def deadline_message(deadline):
+    return "Deadline of {:g} sec exceeded".format(deadline)
+
+def split_timeout(timeout):
+    if isinstance(timeout, (tuple, list)):
+        return tuple(timeout)
+    return timeout, timeout
+
+def conditional_headers(validators, headers=HEADERS):
+    if not validators:
+        return headers
+    headers = dict(headers)
+    for key, value in validators.items():
+        if value:
+            headers[VALIDATORS[key][1]] = value
+    return headers
+
+def response_validators(headers):
+    return {key: headers[name] for key, (name, _) in VALIDATORS.items() if name in headers}
+
+def needs_fallback(status_code, fallback=FALLBACK_CODES):
+    if status_code == 304:
+        return False
+    if fallback is None:
+        return status_code != 200
+    return status_code in fallback
+
+def ranged_status(status_code):
+    # 206 means the range was served, 416 that the resource exists but is empty
+    return 200 if status_code in [206, 416] else status_code
+
+def parse_codes(text):
+    codes = [int(code) for code in text.replace(",", " ").split() if code.isdigit()]
+    return codes or None
+
+def is_alive(status_code):
+    return status_code in [200, 301, 304]
+
+def has_content(status_code):
+    # a live page with a body to parse
+    return status_code != 304 and is_alive(status_code)
+
+def make_result(row, url, status_code, msg, info=None):
+    # a check cut short by a timeout or the deadline failed, even when it
+    # already had a live status code
+    result = {
+        "row": row,
+        "url": url,
+        "result": is_alive(status_code) and not (info and info.get("error")),
+        "status_code": status_code,
+        "msg": msg,
+    }
+    if info:
+        result.update(info)
+    return result
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url, strip_slash=False):
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = "[{}]".format(host) if ":" in host else host
+    if parts.username or parts.password:
+        netloc = "{}@{}".format(parts.netloc.rsplit("@", 1)[0], host)
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = "{}:{}".format(netloc, port)
+    path = parts.path or "/"
+    if strip_slash:
+        path = path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+def unique_rows(urls, key=None, running=lambda: True):
+    rows = []
+    seen = set()
+    for row, url in enumerate(urls):
+        if not row % 10000 and not running():
+            return None
+        item = key(url) if key else url
+        if item not in seen:
+            seen.add(item)
+            rows.append(row)
+    return rows
+
+def url_host(url):
+    # "" for a malformed url, the check reports it as failed
     try:
-        r = requests.head(url, headers=HEADERS, allow_redirects=True, timeout=timeout)
-        if r.status_code != 200:
-            r = requests.get(url, headers=HEADERS, allow_redirects=True, timeout=timeout)
-        status_code = r.status_code
-    except requests.exceptions.ReadTimeout as e:
-        msg = str(e)
-    except Exception as e:
-        msg = str(e)
-    return status_code, msg
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
 
 def split_list(li, n):
     k, m = divmod(len(li), n)
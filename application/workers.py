@@ -1,20 +1,27 @@
 # -*- coding: UTF-8 -*-
 #!/usr/bin/env python
 
+import os
 from time import sleep
 
 from PyQt5.QtCore import QThread, pyqtSlot, pyqtSignal, QObject, QMutex
 
-from .utils import check_alive
+from .cancel import Canceller
+from .engine import AsyncChecker, check_queue
 
 class MyThread(QThread):
     activeCount = 0
 
     def __init__(self, parent=None):
         super(QThread, self).__init__()
-        self.started.connect(self.increaseActiveThreads)
         self.finished.connect(self.decreaseActiveThreads)
 
+    def start(self, *args):
+        # counted here rather than on started() so pulse never sees a gap
+        # between stages
+        self.increaseActiveThreads()
+        super(MyThread, self).start(*args)
+
     @pyqtSlot()
     def increaseActiveThreads(self):
         MyThread.activeCount += 1
@@ -45,28 +52,125 @@ class Worker(QObject):
     def doWork(self, *args, **kwargs):
         raise NotImplementedError
 
-class CheckAliveWorker(Worker):
+    def stop(self):
+        self._running = False
+
+class CancellableWorker(Worker):
+    # stop() also aborts the requests in flight, may be called from any thread
+    def __init__(self, func, *args, **kwargs):
+        super(CancellableWorker, self).__init__(func, *args, **kwargs)
+        self._canceller = Canceller()
+
+    def isRunning(self):
+        return self._running and not self._canceller.cancelled
+
+    def stop(self):
+        super(CancellableWorker, self).stop()
+        self._canceller.cancel()
+
+class CheckAliveWorker(CancellableWorker):
     status = pyqtSignal(tuple)
     __mutex = QMutex()
 
     def doWork(self, *args, **kwargs):
-        queue = kwargs["queue"]
-        timeout = kwargs["timeout"]
-        while self._running and not queue.empty():
-            row, url = queue.get()
-            self.status.emit((row, "Checking ..."))
-            status_code, msg = check_alive(url, timeout)
-            result = True if status_code in [200, 301] else False
-            # CheckAliveWorker.__mutex.lock()
-            self.result.emit({
-                "row": row,
-                "url": url,
-                "result": result,
-                "status_code": status_code,
-                "msg": msg,
-            })
-            self.status.emit((row, "Done"))
-            # CheckAliveWorker.__mutex.unlock()
+        check_queue(
+            kwargs["scheduler"],
+            self._func,
+            kwargs["timeout"],
+            lambda row, status: self.status.emit((row, status)),
+            self.result.emit,
+            running=self.isRunning,
+            resolver=kwargs.get("resolver"),
+            validators=kwargs.get("validators"),
+            content_pool=kwargs.get("contentPool"),
+            keywords=kwargs.get("keywords", ()),
+            canceller=self._canceller,
+            limiter=kwargs.get("limiter"),
+            stats=kwargs.get("stats")
+        )
 
     def test(self):
-        print("Ok")
\ No newline at end of file
+        print("Ok")
+
+class AsyncCheckAliveWorker(CancellableWorker):
+    status = pyqtSignal(tuple)
+
+    def doWork(self, *args, **kwargs):
+        checker = AsyncChecker(self._func, concurrency=kwargs["concurrency"], timeout=kwargs["timeout"],
+            resolver=kwargs.get("resolver"), validators=kwargs.get("validators"),
+            content_pool=kwargs.get("contentPool"), keywords=kwargs.get("keywords", ()),
+            canceller=self._canceller, limiter=kwargs.get("limiter"), stats=kwargs.get("stats"))
+        checker.run(
+            kwargs["scheduler"],
+            lambda row, status: self.status.emit((row, status)),
+            self.result.emit,
+            running=self.isRunning
+        )
+
+class ImportUrlsWorker(Worker):
+    urls = pyqtSignal(list)
+    progress = pyqtSignal(int)
+
+    def doWork(self, *args, **kwargs):
+        filePath = kwargs["filePath"]
+        chunkSize = kwargs["chunkSize"]
+        size = os.path.getsize(filePath) or 1
+        percent = 0
+        chunk = []
+        with open(filePath, "rb") as f:
+            for line in f:
+                if not self._running:
+                    break
+                # lstrip drops the BOM a file saved as "UTF-8 with BOM" starts with
+                url = line.strip().decode("utf-8", "replace").lstrip("\ufeff")
+                if url:
+                    chunk.append(url)
+                if len(chunk) >= chunkSize:
+                    self.urls.emit(chunk)
+                    chunk = []
+                    if int(f.tell() * 100 / size) != percent:
+                        percent = int(f.tell() * 100 / size)
+                        self.progress.emit(percent)
+        if chunk:
+            self.urls.emit(chunk)
+        self.progress.emit(100)
+
+class ResolveWorker(Worker):
+    progress = pyqtSignal(tuple)
+
+    def doWork(self, *args, **kwargs):
+        self._percent = -1
+        self._func(kwargs["hosts"], on_progress=self.onProgress, running=lambda: self._running)
+
+    def onProgress(self, done, total):
+        percent = int(done * 100 / total)
+        if percent != self._percent:
+            self._percent = percent
+            self.progress.emit((done, total))
+
+class LookupWorker(Worker):
+    # runs a blocking lookup off the GUI thread and emits what it returns
+    def doWork(self, *args, **kwargs):
+        self.result.emit(self._func(*args, **kwargs))
+
+class DedupWorker(Worker):
+    rows = pyqtSignal(object)
+
+    def doWork(self, *args, **kwargs):
+        rows = self._func(kwargs["urls"], key=kwargs.get("key"), running=lambda: self._running)
+        if rows is not None:
+            self.rows.emit(rows)
+
+class ExportWorker(Worker):
+    progress = pyqtSignal(tuple)
+
+    def doWork(self, *args, **kwargs):
+        self._percent = -1
+        self._func(kwargs["rows"], kwargs["filePath"], format=kwargs["format"], fields=kwargs["fields"],
+            total=kwargs["total"], on_progress=self.onProgress, running=lambda: self._running)
+
+    def onProgress(self, done, total):
+        percent = int(done * 100 / total)
+        if percent != self._percent:
+            self._percent = percent
+            self.progress.emit((done, total))
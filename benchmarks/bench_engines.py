@@ -0,0 +1,220 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# End to end benchmark of the checking engines against the local server farm
+# (benchmarks/farm.py). Every scenario runs in a fresh process, so the peak
+# RSS reported is that scenario's own.
+#
+#   python -m benchmarks.bench_engines
+#   python -m benchmarks.bench_engines --save baseline.json
+#   python -m benchmarks.bench_engines --compare baseline.json
+#
+# With --compare the exit status is 1 when a scenario's throughput dropped or
+# its p99 latency grew by more than --tolerance.
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import threading
+from functools import partial
+from time import perf_counter
+
+from benchmarks.farm import MIX, make_urls, start_farm
+
+SCENARIOS = ["check_alive", "threads", "threads-adaptive", "worker", "asyncio", "asyncio-adaptive"]
+
+def timed(check, latencies):
+    def wrapper(url, timeout, **kwargs):
+        start = perf_counter()
+        try:
+            return check(url, timeout, **kwargs)
+        finally:
+            latencies.append(perf_counter() - start)
+    return wrapper
+
+def timed_async(check, latencies):
+    async def wrapper(session, url, timeout, **kwargs):
+        start = perf_counter()
+        try:
+            return await check(session, url, timeout, **kwargs)
+        finally:
+            latencies.append(perf_counter() - start)
+    return wrapper
+
+def fill(urls, host_limit):
+    from application.engine import HostScheduler
+    scheduler = HostScheduler(host_limit)
+    for row, url in enumerate(urls):
+        scheduler.put(row, url)
+    return scheduler
+
+def run_check_alive(urls, args, latencies, results):
+    from application.utils import check_alive, create_session, make_result
+    check = timed(partial(check_alive, probe=args.probe), latencies)
+    with create_session() as session:
+        for row, url in enumerate(urls):
+            results.append(make_result(row, url, *check(url, args.timeout, session=session)))
+
+def run_threads(urls, args, latencies, results, adaptive=False):
+    from application.engine import check_queue
+    from application.limiter import AdaptiveLimiter
+    from application.utils import check_alive
+    scheduler = fill(urls, args.host_limit)
+    check = timed(partial(check_alive, probe=args.probe), latencies)
+    limiter = AdaptiveLimiter(args.threads) if adaptive else None
+    threads = [
+        threading.Thread(target=check_queue, args=(scheduler, check, args.timeout, lambda *a: None, results.append),
+            kwargs={"limiter": limiter})
+        for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def run_asyncio(urls, args, latencies, results, adaptive=False):
+    from application.engine import AsyncChecker, check_alive_async
+    from application.limiter import AdaptiveLimiter
+    check = timed_async(partial(check_alive_async, probe=args.probe), latencies)
+    limiter = AdaptiveLimiter(args.concurrency) if adaptive else None
+    AsyncChecker(check, concurrency=args.concurrency, timeout=args.timeout, limiter=limiter).run(
+        fill(urls, args.host_limit), lambda *a: None, results.append)
+
+def run_worker(urls, args, latencies, results):
+    # the GUI path: CheckAliveWorker objects in MyThreads, results delivered
+    # through queued signals to the main thread's event loop
+    from PyQt5.QtCore import QCoreApplication, QTimer
+    from application.utils import check_alive
+    from application.workers import CheckAliveWorker, MyThread
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    scheduler = fill(urls, args.host_limit)
+    check = timed(partial(check_alive, probe=args.probe), latencies)
+    threads = []
+    workers = []
+    for _ in range(args.threads):
+        thread = MyThread()
+        worker = CheckAliveWorker(check, scheduler=scheduler, timeout=args.timeout)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        worker.result.connect(results.append)
+        worker.finished.connect(thread.quit)
+        threads.append(thread)
+        workers.append(worker)
+    timer = QTimer()
+    timer.timeout.connect(lambda: MyThread.activeCount or app.quit())
+    timer.start(10)
+    for thread in threads:
+        thread.start()
+    app.exec_()
+    for thread in threads:
+        thread.wait()
+
+RUNNERS = {
+    "check_alive": run_check_alive,
+    "threads": run_threads,
+    "threads-adaptive": partial(run_threads, adaptive=True),
+    "worker": run_worker,
+    "asyncio": run_asyncio,
+    "asyncio-adaptive": partial(run_asyncio, adaptive=True),
+}
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+def measure(scenario, urls, args, queue):
+    latencies = []
+    results = []
+    start = perf_counter()
+    RUNNERS[scenario](urls, args, latencies, results)
+    elapsed = perf_counter() - start
+    queue.put({
+        "scenario": scenario,
+        "urls": len(urls),
+        "seconds": round(elapsed, 3),
+        "urls_per_sec": round(len(results) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        "ok": sum(1 for result in results if result["result"]),
+        "failed": sum(1 for result in results if not result["result"]),
+    })
+
+def run_scenario(scenario, urls, args):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(scenario, urls, args, queue))
+    process.start()
+    report = queue.get()
+    process.join()
+    return report
+
+def regressions(reports, baseline, tolerance):
+    found = []
+    previous = {report["scenario"]: report for report in baseline}
+    for report in reports:
+        before = previous.get(report["scenario"])
+        if before is None:
+            continue
+        if before["urls"] != report["urls"]:
+            found.append("{}: baseline has {} urls, not {}".format(report["scenario"], before["urls"], report["urls"]))
+            continue
+        if report["urls_per_sec"] < before["urls_per_sec"] * (1 - tolerance):
+            found.append("{}: {} urls/s, was {}".format(report["scenario"], report["urls_per_sec"],
+                before["urls_per_sec"]))
+        if report["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            found.append("{}: p99 {} ms, was {}".format(report["scenario"], report["p99_ms"], before["p99_ms"]))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--sequential-urls", type=int, default=200, help="urls for the single threaded check_alive")
+    parser.add_argument("--hosts", type=int, default=20, help="loopback addresses served by the farm")
+    parser.add_argument("--latency", type=int, default=50, help="mean server latency in ms")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--host-limit", type=int, default=8)
+    parser.add_argument("--timeout", type=int, default=2)
+    parser.add_argument("--probe", default="head_get")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these, may be repeated")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    farm, addresses = start_farm(args.hosts)
+    urls = make_urls(addresses, args.urls, args.latency)
+    print("{} urls on {} hosts, mean latency {} ms, mix {}".format(args.urls, len(addresses), args.latency,
+        ", ".join("{} {}%".format(kind, weight) for kind, weight in MIX.items())))
+    print("{:18} {:>6} {:>8} {:>8} {:>8} {:>8} {:>8} {:>6} {:>6}".format(
+        "scenario", "urls", "seconds", "urls/s", "p50 ms", "p99 ms", "RSS MB", "ok", "failed"))
+    reports = []
+    for scenario in args.scenario or SCENARIOS:
+        if scenario == "worker":
+            try:
+                import PyQt5
+            except ImportError:
+                print("{:18} skipped, PyQt5 is not installed".format(scenario))
+                continue
+        report = run_scenario(scenario, urls[:args.sequential_urls] if scenario == "check_alive" else urls, args)
+        reports.append(report)
+        print("{scenario:18} {urls:>6} {seconds:>8.2f} {urls_per_sec:>8.1f} {p50_ms:>8.1f} {p99_ms:>8.1f} "
+            "{peak_rss_mb:>8.1f} {ok:>6} {failed:>6}".format(**report))
+    farm.terminate()
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(reports, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(reports, json.load(f), args.tolerance)
+        for line in found:
+            print("REGRESSION " + line)
+        return 1 if found else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# Compares static split_list partitioning with the shared work queue on a
+# skewed synthetic list where the slow hosts are clustered together.
+#
+#   python -m benchmarks.bench_queue
+
+import argparse
+import threading
+from time import perf_counter, sleep
+
+from application.engine import HostScheduler, check_queue
+from application.utils import split_list
+
+def fake_check(url, timeout, session=None, validators=None):
+    sleep(float(url.rsplit("/", 1)[1]))
+    return 200, '', None
+
+def skewed_urls(count, slow_ratio, slow, fast):
+    slow_count = int(count * slow_ratio)
+    return ["http://host{}.bench/{}".format(i, slow if i < slow_count else fast) for i in range(count)]
+
+def run_threads(schedulers):
+    threads = [
+        threading.Thread(target=check_queue, args=(scheduler, fake_check, 0, lambda *a: None, lambda r: None))
+        for scheduler in schedulers
+    ]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return perf_counter() - start
+
+def partitioned(urls, threads):
+    schedulers = []
+    for rows in split_list(range(len(urls)), threads):
+        scheduler = HostScheduler()
+        for row in rows:
+            scheduler.put(row, urls[row])
+        schedulers.append(scheduler)
+    return run_threads(schedulers)
+
+def shared(urls, threads):
+    scheduler = HostScheduler()
+    for row, url in enumerate(urls):
+        scheduler.put(row, url)
+    return run_threads([scheduler] * threads)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--slow", type=float, default=0.2)
+    parser.add_argument("--fast", type=float, default=0.005)
+    args = parser.parse_args()
+    urls = skewed_urls(args.urls, args.slow_ratio, args.slow, args.fast)
+    ideal = (args.urls * args.slow_ratio * args.slow + args.urls * (1 - args.slow_ratio) * args.fast) / args.threads
+    print("{} urls, {} threads, ideal {:.2f}s".format(args.urls, args.threads, ideal))
+    print("split_list partitions: {:.2f}s".format(partitioned(urls, args.threads)))
+    print("shared queue:          {:.2f}s".format(shared(urls, args.threads)))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# Measures how long a run takes to stop while every request is stuck, either
+# waiting for a response (server never answers) or in connect() (listen
+# backlog full, SYNs are dropped).
+#
+#   python -m benchmarks.bench_stop
+
+import argparse
+import socket
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import perf_counter, sleep
+
+from application.cancel import Canceller
+from application.engine import AsyncChecker, HostScheduler, check_alive_async, check_queue
+from application.utils import check_alive
+
+class HangingHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        sleep(60)
+
+    do_GET = do_HEAD
+
+    def log_message(self, *args):
+        pass
+
+class HangingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def hanging_server():
+    server = HangingServer(("127.0.0.1", 0), HangingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+def blackhole():
+    # never accepts; once the backlog is full further connects hang in SYN_SENT
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(0)
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(sock.getsockname())
+    return sock, sock.getsockname()[1]
+
+def run(engine, port, count, workers, timeout, delay):
+    scheduler = HostScheduler(host_limit=count)
+    for row in range(count):
+        scheduler.put(row, "http://127.0.0.1:{}/{}".format(port, row))
+    canceller = Canceller()
+    running = lambda: not canceller.cancelled
+    results = []
+    if engine == "asyncio":
+        checker = AsyncChecker(partial(check_alive_async, probe="head"), concurrency=workers, timeout=timeout,
+            canceller=canceller)
+        threads = [threading.Thread(target=checker.run,
+            args=(scheduler, lambda *a: None, results.append, running))]
+    else:
+        threads = [
+            threading.Thread(target=check_queue,
+                args=(scheduler, partial(check_alive, probe="head"), timeout, lambda *a: None, results.append,
+                    running),
+                kwargs={"canceller": canceller})
+            for _ in range(workers)
+        ]
+    for thread in threads:
+        thread.start()
+    sleep(delay)
+    start = perf_counter()
+    canceller.cancel()
+    scheduler.clear()
+    for thread in threads:
+        thread.join()
+    return perf_counter() - start, len(results)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds to run before stopping")
+    args = parser.parse_args()
+    hanging_port = hanging_server()
+    _, blackhole_port = blackhole()
+    print("{} urls, timeout {}s, stop after {}s".format(args.urls, args.timeout, args.delay))
+    for engine, workers in (("threads", args.threads), ("asyncio", args.concurrency)):
+        for name, port in (("no response", hanging_port), ("connect hang", blackhole_port)):
+            elapsed, finished = run(engine, port, args.urls, workers, args.timeout, args.delay)
+            print("{:8} x{:<4} {:13} stopped in {:.3f}s ({} results recorded)".format(
+                engine, workers, name, elapsed, finished))
+
+if __name__ == "__main__":
+    main()
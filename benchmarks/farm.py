@@ -0,0 +1,136 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+# Local stand-in for the internet: one threaded HTTP server per loopback
+# address (127.0.0.1, 127.0.0.2, ...) so every server counts as its own host.
+# Behaviour is picked by the path, the latency by the d= query argument:
+#
+#   /ok?d=50            200 after 50 ms
+#   /status/503?d=50    given status
+#   /redirect/3?d=50    redirect chain of 3 hops ending at /ok
+#   /slow?d=50          200 with a body trickled out in small chunks
+#   /hang               accepts and never answers
+#   /reset              closes the connection with a TCP reset
+#
+# make_urls() draws a reproducible url list from a weighted mix.
+
+import multiprocessing
+import random
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep
+from urllib.parse import parse_qs, urlsplit
+
+MIX = {
+    "ok": 70,
+    "status": 10,
+    "redirect": 8,
+    "slow": 5,
+    "hang": 2,
+    "reset": 5,
+}
+STATUSES = [301, 403, 404, 405, 500, 503]
+SLOW_CHUNKS = 8
+
+class FarmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        self.respond(False)
+
+    def do_GET(self):
+        self.respond(True)
+
+    def respond(self, body):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        sleep(int(query.get("d", ["0"])[0]) / 1000.0)
+        kind, _, arg = parts.path.strip("/").partition("/")
+        if kind == "hang":
+            sleep(3600)
+        elif kind == "reset":
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self.close_connection = True
+            self.connection.close()
+        elif kind == "redirect" and int(arg or 0) > 0:
+            self.send_response(302)
+            self.send_header("Location", "/redirect/{}?{}".format(int(arg) - 1, parts.query))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif kind == "slow":
+            chunk = b"<p>" + b"x" * 1021
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(chunk) * SLOW_CHUNKS))
+            self.end_headers()
+            if body:
+                for _ in range(SLOW_CHUNKS):
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+                    sleep(0.05)
+        else:
+            page = b"<html><head><title>Farm</title></head><body>ok</body></html>"
+            self.send_response(int(arg) if kind == "status" else 200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            if body:
+                self.wfile.write(page)
+
+    def log_message(self, *args):
+        pass
+
+class FarmServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def loopback_addresses(count):
+    # 127.0.0.0/8 is routed to lo on Linux; elsewhere fall back to one host
+    addresses = []
+    for i in range(1, count + 1):
+        address = "127.0.0.{}".format(i)
+        try:
+            probe = socket.socket()
+            probe.bind((address, 0))
+            probe.close()
+        except OSError:
+            break
+        addresses.append(address)
+    return addresses or ["127.0.0.1"]
+
+def serve(hosts, ready):
+    servers = [FarmServer((address, 0), FarmHandler) for address in loopback_addresses(hosts)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.put(["{}:{}".format(*server.server_address) for server in servers])
+    threading.Event().wait()
+
+def start_farm(hosts):
+    # runs in its own process so the servers do not compete with the client
+    # for the GIL or show up in its memory use
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    process = context.Process(target=serve, args=(hosts, ready), daemon=True)
+    process.start()
+    return process, ready.get()
+
+def make_urls(addresses, count, latency=50, mix=MIX, seed=0):
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    urls = []
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        delay = int(rng.expovariate(1.0 / latency)) if latency else 0
+        if kind == "status":
+            path = "status/{}".format(rng.choice(STATUSES))
+        elif kind == "redirect":
+            path = "redirect/{}".format(rng.randint(1, 3))
+        else:
+            path = kind
+        urls.append("http://{}/{}?d={}&n={}".format(addresses[i % len(addresses)], path, delay, i))
+    return urls
@@ -0,0 +1,74 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import unittest
+
+from application.engine import HostScheduler
+
+def take_all(scheduler):
+    items = []
+    item = scheduler.take()
+    while item is not None:
+        items.append(item)
+        item = scheduler.take()
+    return items
+
+class HostSchedulerTest(unittest.TestCase):
+    def test_host_limit(self):
+        scheduler = HostScheduler(2)
+        for row in range(5):
+            scheduler.put(row, "http://a.example/{}".format(row))
+        self.assertEqual(take_all(scheduler), [(0, "http://a.example/0"), (1, "http://a.example/1")])
+        self.assertEqual(len(scheduler), 3)
+        scheduler.done("http://a.example/0")
+        self.assertEqual(take_all(scheduler), [(2, "http://a.example/2")])
+
+    def test_round_robin(self):
+        scheduler = HostScheduler(4)
+        urls = ["http://a.example/1", "http://a.example/2", "http://b.example/1", "http://b.example/2",
+            "http://c.example/1"]
+        for row, url in enumerate(urls):
+            scheduler.put(row, url)
+        self.assertEqual([url for _, url in take_all(scheduler)], [
+            "http://a.example/1", "http://b.example/1", "http://c.example/1",
+            "http://a.example/2", "http://b.example/2",
+        ])
+
+    def test_hosts_are_case_insensitive(self):
+        scheduler = HostScheduler(1)
+        scheduler.put(0, "http://A.example/")
+        scheduler.put(1, "http://a.EXAMPLE/x")
+        self.assertEqual(len(take_all(scheduler)), 1)
+        self.assertEqual(scheduler.hosts(), ["a.example"])
+
+    def test_clear(self):
+        scheduler = HostScheduler(1)
+        for row in range(3):
+            scheduler.put(row, "http://a.example/{}".format(row))
+        scheduler.put(3, "http://b.example/")
+        self.assertEqual(len(take_all(scheduler)), 2)
+        self.assertEqual(scheduler.clear(), 2)
+        self.assertEqual(len(scheduler), 0)
+        # urls still in flight finish after the clear without re-queueing anything
+        scheduler.done("http://a.example/0")
+        scheduler.done("http://b.example/")
+        self.assertIsNone(scheduler.take())
+        self.assertIsNone(scheduler.get())
+
+    def test_malformed_url(self):
+        # queued under an empty host so the check reports it, not the scheduler
+        scheduler = HostScheduler(1)
+        scheduler.put(0, "http://[::1/")
+        scheduler.put(1, "http://a.example/")
+        self.assertEqual(take_all(scheduler), [(0, "http://[::1/"), (1, "http://a.example/")])
+        scheduler.done("http://[::1/")
+        self.assertEqual(len(scheduler), 0)
+
+    def test_get_returns_none_when_empty(self):
+        scheduler = HostScheduler(1)
+        scheduler.put(0, "http://a.example/")
+        self.assertEqual(scheduler.get(), (0, "http://a.example/"))
+        self.assertIsNone(scheduler.get())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import io
+import json
+import unittest
+
+from application.exporters import JsonLinesWriter, JsonWriter, result_row
+
+RESULT = {"url": "http://a.example/", "result": True, "status_code": 200, "msg": "", "total_ms": 12.5}
+
+class JsonWriterTest(unittest.TestCase):
+    def test_empty(self):
+        f = io.StringIO()
+        JsonWriter(f).close()
+        self.assertEqual(json.loads(f.getvalue()), [])
+
+    def test_rows(self):
+        f = io.StringIO()
+        writer = JsonWriter(f)
+        writer.write(result_row(RESULT))
+        writer.write(result_row(dict(RESULT, result=False, status_code=None, msg="Timed out")))
+        writer.close()
+        rows = json.loads(f.getvalue())
+        self.assertEqual([row["Result"] for row in rows], ["OK", "Fail"])
+        self.assertEqual(rows[0]["Total ms"], 12.5)
+        self.assertIsNone(rows[0]["DNS ms"])
+
+class JsonLinesWriterTest(unittest.TestCase):
+    def test_one_object_per_line(self):
+        f = io.StringIO()
+        writer = JsonLinesWriter(f)
+        writer.write(result_row(RESULT))
+        writer.write(result_row(RESULT))
+        writer.close()
+        lines = f.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])["URL"], "http://a.example/")
+
+if __name__ == "__main__":
+    unittest.main()
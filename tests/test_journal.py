@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from application.journal import JOURNAL_FIELDS, Journal, load_journal
+
+def result(url, ok=True):
+    return {"row": 0, "url": url, "result": ok, "status_code": 200 if ok else None, "msg": "" if ok else "Error"}
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "journal", "run.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def records(self):
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_one_record_per_line(self):
+        journal = Journal(self.path)
+        journal.write_many([result("http://a/"), result("http://b/", False)])
+        journal.close()
+        records = self.records()
+        self.assertEqual([record["url"] for record in records], ["http://a/", "http://b/"])
+        self.assertEqual(sorted(records[0]), sorted(JOURNAL_FIELDS + ["logged_at"]))
+        self.assertFalse(records[1]["result"])
+
+    def test_appends(self):
+        for url in ("http://a/", "http://b/"):
+            journal = Journal(self.path)
+            journal.write_many([result(url)])
+            journal.close()
+        self.assertEqual([record["url"] for record in self.records()], ["http://a/", "http://b/"])
+
+    def test_load(self):
+        journal = Journal(self.path)
+        journal.write_many([result("http://a/"), result("http://b/", False)])
+        journal.close()
+        done = load_journal(self.path)
+        self.assertEqual(sorted(done), ["http://a/", "http://b/"])
+        self.assertFalse(done["http://b/"]["result"])
+
+    def test_last_record_wins(self):
+        journal = Journal(self.path)
+        journal.write_many([result("http://a/", False)])
+        journal.write_many([result("http://a/")])
+        journal.close()
+        self.assertTrue(load_journal(self.path)["http://a/"]["result"])
+
+    def test_truncated_last_line(self):
+        journal = Journal(self.path)
+        journal.write_many([result("http://a/"), result("http://b/")])
+        journal.close()
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 20)
+        self.assertEqual(list(load_journal(self.path)), ["http://a/"])
+        # appending after the crash starts a new line instead of gluing onto the broken one
+        journal = Journal(self.path)
+        journal.write_many([result("http://c/")])
+        journal.close()
+        self.assertEqual(sorted(load_journal(self.path)), ["http://a/", "http://c/"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import unittest
+
+from application.limiter import AdaptiveLimiter
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_grows_while_throughput_keeps_up(self):
+        limiter = AdaptiveLimiter(100, start=4)
+        limiter._adjust(10.0, 0.0)
+        self.assertEqual(limiter.limit, 9)
+        limiter._adjust(9.5, 0.0)
+        self.assertEqual(limiter.limit, 14)
+
+    def test_capped_at_maximum(self):
+        limiter = AdaptiveLimiter(10, start=8)
+        for _ in range(5):
+            limiter._adjust(100.0, 0.0)
+        self.assertEqual(limiter.limit, 10)
+
+    def test_holds_when_throughput_drops(self):
+        limiter = AdaptiveLimiter(100, start=20)
+        limiter._adjust(100.0, 0.0)
+        limiter._adjust(50.0, 0.0)
+        self.assertEqual(limiter.limit, 25)
+
+    def test_halved_on_error_spike(self):
+        limiter = AdaptiveLimiter(100, start=40)
+        limiter._adjust(10.0, 0.05)
+        self.assertEqual(limiter.limit, 45)
+        limiter._adjust(10.0, 0.5)
+        self.assertEqual(limiter.limit, 22)
+
+    def test_usual_error_rate_is_not_a_spike(self):
+        # dead sites fail all the time, only a jump above the baseline counts
+        limiter = AdaptiveLimiter(100, start=10)
+        limiter._adjust(10.0, 0.3)
+        limiter._adjust(10.0, 0.35)
+        self.assertEqual(limiter.limit, 20)
+
+    def test_never_below_one(self):
+        limiter = AdaptiveLimiter(100, start=1)
+        limiter._adjust(10.0, 0.0)
+        limiter.limit = 1
+        limiter._adjust(10.0, 1.0)
+        self.assertEqual(limiter.limit, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding: UTF-8 -*-
+#!/usr/bin/env python
+
+import unittest
+from functools import partial
+
+from application.utils import normalize_url, unique_rows
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_scheme_and_host_are_lowercased(self):
+        self.assertEqual(normalize_url("HTTP://Example.COM/Path"), "http://example.com/Path")
+
+    def test_default_port_is_dropped(self):
+        self.assertEqual(normalize_url("http://example.com:80/"), "http://example.com/")
+        self.assertEqual(normalize_url("https://example.com:443/"), "https://example.com/")
+        self.assertEqual(normalize_url("http://example.com:8080/"), "http://example.com:8080/")
+
+    def test_empty_path_and_fragment(self):
+        self.assertEqual(normalize_url(" http://example.com#top "), "http://example.com/")
+        self.assertEqual(normalize_url("http://example.com/a?b=1#c"), "http://example.com/a?b=1")
+
+    def test_strip_slash(self):
+        self.assertEqual(normalize_url("http://example.com/a/", strip_slash=True), "http://example.com/a")
+        self.assertEqual(normalize_url("http://example.com/", strip_slash=True), "http://example.com/")
+
+    def test_credentials_and_ipv6(self):
+        self.assertEqual(normalize_url("http://user:pw@Example.com/"), "http://user:pw@example.com/")
+        self.assertEqual(normalize_url("http://[::1]:8000/"), "http://[::1]:8000/")
+
+    def test_invalid_url_is_kept(self):
+        self.assertEqual(normalize_url("http://[::1/ "), "http://[::1/")
+        self.assertEqual(normalize_url("http://example.com:port/"), "http://example.com/")
+
+class UniqueRowsTest(unittest.TestCase):
+    def test_first_occurrence_is_kept(self):
+        urls = ["http://a/", "http://b/", "http://a/", "http://c/", "http://b/"]
+        self.assertEqual(unique_rows(urls), [0, 1, 3])
+
+    def test_key(self):
+        urls = ["http://a.example/x", "HTTP://A.example:80/x/", "http://a.example/y"]
+        self.assertEqual(unique_rows(urls), [0, 1, 2])
+        self.assertEqual(unique_rows(urls, key=partial(normalize_url, strip_slash=True)), [0, 2])
+
+    def test_stopped(self):
+        self.assertIsNone(unique_rows(["http://a/"], running=lambda: False))
+
+if __name__ == "__main__":
+    unittest.main()